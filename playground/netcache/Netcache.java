@@ -51,6 +51,9 @@ public class Netcache implements Runnable, Comparator<Object[]> {
 					if (args[0].equals("LST")) {
 						lst(args, in, out);
 					}
+					else if (args[0].equals("HAS")) {
+						has(args, in, out);
+					}
 					else if (args[0].equals("PUT") && port == PORT_UPLOAD) {
 						put(args, in, out);
 					}
@@ -105,6 +108,34 @@ public class Netcache implements Runnable, Comparator<Object[]> {
 		out.write(ret);
 	}
 
+	public void has(String[] args, InputStream in, OutputStream out) throws IOException {
+		int size = new Integer(args[1].trim());
+		byte[] buf = new byte[size];
+		int off = 0;
+		while (off < size) {
+			int c = in.read(buf, off, size - off);
+			if (c < 0) {
+				throw new RuntimeException("Connection closed too early");
+			}
+			off += c;
+		}
+
+		StringBuilder b = new StringBuilder();
+		synchronized(flist) {
+			for (String name : new String(buf).split("\n")) {
+				if (flist.containsKey(name)) {
+					b.append(name);
+					b.append("\n");
+				}
+			}
+		}
+
+		byte[] ret = b.toString().getBytes();
+		String header = String.format("%-128s", String.format("%d,", ret.length));
+		out.write(header.getBytes());
+		out.write(ret);
+	}
+
 	public void put(String[] args, InputStream in, OutputStream out) throws IOException {
 		File cachedir = new File(CACHEDIR);
 		File temp = File.createTempFile("foo", ".suffix", cachedir);
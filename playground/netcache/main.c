@@ -0,0 +1,5 @@
+int lib_function();
+
+int main() {
+	return lib_function();
+}
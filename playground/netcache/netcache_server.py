@@ -0,0 +1,231 @@
+#! /usr/bin/env python3
+# encoding: utf-8
+
+"""
+Python version of Netcache.java (same protocol, same cache layout), to use
+waflib/extras/netcache_client.py without Java. Requires Python >= 3.5:
+
+	$ ./netcache_server.py --dir=/tmp/wafcache
+	$ NETCACHE=127.0.0.1:11001 waf build   # or NETCACHE_PULL/NETCACHE_PUSH
+
+The requests are 128-byte headers made of comma-separated values:
+
+* LST: list the entries
+* HAS,size: followed by size bytes of entry names (one per line), returns the names of the entries present
+* GET,entry,index: returns one file of an entry (size -1 if the file is missing)
+* PUT,entry,index,size: followed by the file contents, no response
+* CLEAN: remove the least recently used entries if the cache exceeds its maximum size
+* BYE: close the connection
+
+The responses are 128-byte headers containing the size of the data that follows.
+The hit rate and the throughput are displayed every --stats seconds and on exit.
+"""
+
+import os, sys, asyncio, time, tempfile, shutil, optparse, signal
+
+HEADER_SIZE = 128
+BUF = 8192 * 16
+CLEANRATIO = 0.8
+
+class Cache(object):
+	def __init__(self, path, maxsize):
+		self.path = path
+		self.maxsize = maxsize
+		self.entries = {} # name -> [mtime, size]
+		self.total = 0
+		self.stats = {'hits': 0, 'misses': 0, 'found': 0, 'lookups': 0, 'get': 0, 'put': 0, 'has': 0, 'lst': 0}
+		self.start = time.time()
+		os.makedirs(path, exist_ok=True)
+		for x in os.listdir(path):
+			sub = os.path.join(path, x)
+			if len(x) != 2 or not os.path.isdir(sub):
+				continue
+			for y in os.listdir(sub):
+				dname = os.path.join(sub, y)
+				if os.path.isdir(dname):
+					size = sum(os.path.getsize(os.path.join(dname, z)) for z in os.listdir(dname))
+					self.entries[y] = [os.path.getmtime(dname), size]
+					self.total += size
+
+	def entry_dir(self, name):
+		if len(name) < 2 or os.sep in name or name.startswith('.'):
+			raise ValueError('invalid entry name %r' % name)
+		return os.path.join(self.path, name[:2], name)
+
+	def touch(self, name):
+		try:
+			self.entries[name][0] = time.time()
+			os.utime(self.entry_dir(name), None)
+		except (KeyError, OSError):
+			pass
+
+	def add(self, name, size):
+		try:
+			entry = self.entries[name]
+		except KeyError:
+			entry = self.entries[name] = [0, 0]
+		entry[0] = time.time()
+		entry[1] += size
+		self.total += size
+		if self.total > self.maxsize:
+			self.clean()
+
+	def clean(self):
+		for (name, (mtime, size)) in sorted(self.entries.items(), key=lambda x: x[1][0]):
+			if self.total <= self.maxsize * CLEANRATIO:
+				break
+			shutil.rmtree(self.entry_dir(name), ignore_errors=True)
+			del self.entries[name]
+			self.total -= size
+
+	def report(self):
+		s = self.stats
+		d = time.time() - self.start
+		gets = s['hits'] + s['misses']
+		print('%d entries, %d MB; %d HAS (%.1f%% of %d entries found), %d GET (%.1f%% hits), %d LST, %d PUT; sent %.1f MB/s, received %.1f MB/s' % (
+			len(self.entries), self.total // (1024 * 1024), s['has'], s['lookups'] and 100.0 * s['found'] / s['lookups'], s['lookups'],
+			s['get'], gets and 100.0 * s['hits'] / gets, s['lst'], s['put'], s.get('sent', 0) / d / 1024 / 1024, s.get('received', 0) / d / 1024 / 1024))
+		sys.stdout.flush()
+
+def count(cache, key, val):
+	cache.stats[key] = cache.stats.get(key, 0) + val
+
+async def send(writer, cache, data):
+	writer.write(data)
+	count(cache, 'sent', len(data))
+	await writer.drain()
+
+async def send_header(writer, cache, size):
+	await send(writer, cache, ('%d,' % size).ljust(HEADER_SIZE).encode('iso8859-1'))
+
+async def handle(reader, writer, cache, port, upload_port, download_port):
+	try:
+		while True:
+			try:
+				header = await reader.readexactly(HEADER_SIZE)
+			except asyncio.IncompleteReadError:
+				break
+			count(cache, 'received', HEADER_SIZE)
+			args = header.decode('iso8859-1').split(',')
+			cmd = args[0].strip()
+
+			if cmd == 'LST':
+				cache.stats['lst'] += 1
+				data = ''.join(x + '\n' for x in cache.entries).encode('iso8859-1')
+				await send_header(writer, cache, len(data))
+				await send(writer, cache, data)
+
+			elif cmd == 'HAS':
+				cache.stats['has'] += 1
+				size = int(args[1].strip())
+				data = await reader.readexactly(size)
+				count(cache, 'received', size)
+				names = data.decode('iso8859-1').splitlines()
+				ret = [x for x in names if x in cache.entries]
+				cache.stats['found'] += len(ret)
+				cache.stats['lookups'] += len(names)
+				data = ''.join(x + '\n' for x in ret).encode('iso8859-1')
+				await send_header(writer, cache, len(data))
+				await send(writer, cache, data)
+
+			elif cmd == 'GET' and port == download_port:
+				cache.stats['get'] += 1
+				name = args[1].strip()
+				path = os.path.join(cache.entry_dir(name), args[2].strip())
+				try:
+					f = open(path, 'rb')
+				except OSError:
+					cache.stats['misses'] += 1
+					await send_header(writer, cache, -1)
+					continue
+				cache.stats['hits'] += 1
+				cache.touch(name)
+				with f:
+					await send_header(writer, cache, os.fstat(f.fileno()).st_size)
+					while True:
+						data = f.read(BUF)
+						if not data:
+							break
+						await send(writer, cache, data)
+
+			elif cmd == 'PUT' and port == upload_port:
+				cache.stats['put'] += 1
+				name = args[1].strip()
+				dname = cache.entry_dir(name)
+				size = int(args[3].strip())
+				os.makedirs(dname, exist_ok=True)
+				(fd, tmp) = tempfile.mkstemp(dir=cache.path)
+				try:
+					with os.fdopen(fd, 'wb') as f:
+						cnt = 0
+						while cnt < size:
+							data = await reader.read(min(BUF, size - cnt))
+							if not data:
+								raise ValueError('connection closed too early')
+							f.write(data)
+							cnt += len(data)
+					count(cache, 'received', size)
+					dest = os.path.join(dname, args[2].strip())
+					if os.path.exists(dest):
+						# replaced
+						cache.add(name, -os.path.getsize(dest))
+					os.rename(tmp, dest)
+				except:
+					os.remove(tmp)
+					raise
+				cache.add(name, size)
+
+			elif cmd == 'CLEAN':
+				cache.clean()
+
+			elif cmd == 'BYE':
+				break
+
+			else:
+				print('Invalid command %r on port %d' % (header, port))
+				break
+	except (ValueError, OSError, asyncio.IncompleteReadError) as e:
+		print('Connection error on port %d: %r' % (port, e))
+	finally:
+		writer.close()
+
+async def report(cache, interval):
+	while True:
+		await asyncio.sleep(interval)
+		cache.report()
+
+def main():
+	parser = optparse.OptionParser()
+	parser.add_option('--dir', default='/tmp/wafcache/', help='cache folder [default: %default]')
+	parser.add_option('--host', default='127.0.0.1', help='address to listen to [default: %default]')
+	parser.add_option('--upload', type='int', default=11001, help='port for PUT [default: %default]')
+	parser.add_option('--download', type='int', default=12001, help='port for GET [default: %default]')
+	parser.add_option('--max', type='int', default=10240, help='maximum cache size in MB [default: %default]')
+	parser.add_option('--stats', type='int', default=10, help='statistics display interval in seconds, 0 to disable [default: %default]')
+	(opts, args) = parser.parse_args()
+
+	cache = Cache(opts.dir, opts.max * 1024 * 1024)
+	loop = asyncio.get_event_loop()
+	for port in set([opts.upload, opts.download]):
+		def cb(r, w, port=port):
+			return handle(r, w, cache, port, opts.upload, opts.download)
+		loop.run_until_complete(asyncio.start_server(cb, opts.host, port))
+	if opts.stats:
+		loop.create_task(report(cache, opts.stats))
+	try:
+		loop.add_signal_handler(signal.SIGTERM, loop.stop)
+	except NotImplementedError:
+		# windows
+		pass
+
+	print('ready (%d dirs)' % len(cache.entries))
+	sys.stdout.flush()
+	try:
+		loop.run_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		cache.report()
+
+if __name__ == '__main__':
+	main()
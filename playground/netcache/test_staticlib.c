@@ -0,0 +1,3 @@
+int lib_function() {
+	return 0;
+}
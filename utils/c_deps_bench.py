@@ -0,0 +1,91 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+"""
+Compares the dependencies computed by the Python preprocessor
+(waflib.Tools.c_preproc) with the dependencies reported by the compilers
+(waflib.Tools.c_deps) on a project created by genbench.py:
+
+* time spent by the preprocessor to scan the files
+* time spent reading the equivalent .d files written by gcc -MMD
+* size of the dependencies in the build cache, as lists of nodes
+  (bld.node_deps) and as arrays of path indices (bld.compiler_deps)
+
+Usage:
+./c_deps_bench.py <folder created by genbench.py>
+
+For example:
+./genbench.py /tmp/build 50 100 15 5
+./c_deps_bench.py /tmp/build
+"""
+
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+	import cPickle
+except ImportError:
+	import pickle as cPickle
+
+from waflib import Context, ConfigSet, Node
+from waflib.Tools import c_preproc, c_deps
+
+def make_rule(obj, src, deps, cwd):
+	lst = [src.path_from(cwd)] + [x.path_from(cwd) for x in deps]
+	return '%s: %s\n' % (obj, ' \\\n  '.join(lst))
+
+def dump(data, root):
+	Node.pickle_lock.acquire()
+	try:
+		Node.Nod3 = root.__class__
+		return cPickle.dumps((Node.flat_tree(root), data), -1)
+	finally:
+		Node.pickle_index = None
+		Node.pickle_lock.release()
+
+if __name__ == '__main__':
+	if len(sys.argv) < 2:
+		print(__doc__)
+		sys.exit(1)
+
+	ctx = Context.Context(run_dir=os.getcwd())
+	env = ConfigSet.ConfigSet()
+	top = ctx.srcnode = ctx.root.find_dir(os.path.abspath(sys.argv[1]))
+	cwd = ctx.bldnode = top.make_node('build')
+	files = top.ant_glob('**/*.cpp')
+	print('%d files' % len(files))
+
+	t = time.time()
+	node_deps = {}
+	for (i, node) in enumerate(files):
+		parser = c_preproc.c_parser([top])
+		parser.start(node, env)
+		node_deps[i] = parser.nodes
+	d = time.time() - t
+	print('c_preproc: %.3fs to scan the files' % d)
+
+	rules = [make_rule('%d.o' % i, node, node_deps[i], cwd) for (i, node) in enumerate(files)]
+	base = cwd.abspath()
+	ctx.dep_paths = {}
+	c_deps.init_deps(ctx)
+	t = time.time()
+	compiler_deps = {}
+	for (i, txt) in enumerate(rules):
+		src = files[i].abspath()
+		ids = []
+		for x in c_deps.parse_deps(txt)[1:]:
+			x = os.path.normpath(os.path.join(base, x))
+			if x != src:
+				ids.append(c_deps.get_id(ctx, x))
+		compiler_deps[i] = c_deps.pack(ids)
+	d = time.time() - t
+	print('c_deps: %.3fs to read the .d files' % d)
+
+	# the node tree is stored in both cases
+	count = sum([len(x) for x in node_deps.values()])
+	tree = len(dump(None, ctx.root))
+	for (name, data) in (('node lists', node_deps), ('path indices', (compiler_deps, ctx.dep_paths))):
+		t = time.time()
+		size = len(dump(data, ctx.root)) - tree
+		d = time.time() - t
+		print('%s: %d bytes (%.1f bytes per dependency), stored in %.3fs' % (name, size, float(size) / count, d))
@@ -0,0 +1,36 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+"""
+Measures the cost of the hash functions available for the file and task
+signatures (waflib.Utils.hash_algorithms, see waflib.Utils.set_hash) by
+hashing data in chunks of the same size as waflib.Utils.h_file.
+
+Usage:
+./hash_bench.py [data size in MB]
+
+For example:
+./hash_bench.py 512
+"""
+
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from waflib import Utils
+
+CHUNK = 200000
+
+if __name__ == '__main__':
+	size = int(sys.argv[1]) if len(sys.argv) > 1 else 256
+	data = os.urandom(CHUNK)
+	count = size * 1024 * 1024 // CHUNK
+
+	for name in sorted(Utils.hash_algorithms.keys()):
+		fun = Utils.hash_algorithms[name]
+		t = time.time()
+		m = fun()
+		for i in range(count):
+			m.update(data)
+		m.digest()
+		d = time.time() - t
+		print('%s %dMB: %.3fs, %.3fs per GB' % (name.ljust(10), size, d, d * 1024 / size))
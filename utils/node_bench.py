@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+"""
+Measures the memory used by the node tree (waflib.Node.Node) and the cost of
+its serialization in the build cache, as a flat path table
+(waflib.Node.flat_tree) and as nested node states (Node.__getstate__).
+
+The tree is made of folders containing 20 files and 5 sub-folders each.
+The memory is measured with tracemalloc (Python >= 3.4).
+
+Usage:
+./node_bench.py [number of nodes]
+
+For example:
+./node_bench.py 1500000
+"""
+
+import os, sys, time, gc
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+	import cPickle
+except ImportError:
+	import pickle as cPickle
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
+from waflib import Context, Node
+
+FILES = 20
+DIRS = 5
+
+def make_tree(root, count):
+	total = 0
+	todo = [root]
+	while total < count:
+		cur = todo.pop(0)
+		for i in range(FILES):
+			cur.make_node('file_%d.c' % i)
+		for i in range(DIRS):
+			todo.append(cur.make_node('dir_%d' % i))
+		total += FILES + DIRS
+	return total
+
+def measure(fun):
+	gc.collect()
+	if tracemalloc:
+		tracemalloc.start()
+	t = time.time()
+	ret = fun()
+	d = time.time() - t
+	mem = 0
+	if tracemalloc:
+		mem = tracemalloc.get_traced_memory()[0]
+		tracemalloc.stop()
+	return ret, d, mem
+
+if __name__ == '__main__':
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+	sys.setrecursionlimit(100000)
+
+	ctx = Context.Context(run_dir=os.getcwd())
+	root = ctx.node_class('', None)
+	total, d, mem = measure(lambda: make_tree(root, count))
+	print('create %d nodes: %.3fs, %d bytes per node' % (total, d, mem // total))
+
+	Node.Nod3 = ctx.node_class
+	def flat():
+		try:
+			return cPickle.dumps(Node.flat_tree(root), -1)
+		finally:
+			Node.pickle_index = None
+	def nested():
+		return cPickle.dumps(root, -1)
+
+	for name, fun in (('flat', flat), ('nested', nested)):
+		data, d, mem = measure(fun)
+		print('%s dump:   %.3fs, %d bytes' % (name.ljust(6), d, len(data)))
+		def load():
+			try:
+				return cPickle.loads(data)
+			finally:
+				Node.pickle_nodes = None
+		ret, d, mem = measure(load)
+		print('%s load:   %.3fs, %d bytes per node' % (name.ljust(6), d, mem // total))
+		del ret, data
@@ -0,0 +1,52 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+"""
+Measures the cost of executing commands through the pre-forked processes
+(waflib.Utils.run_prefork_process) and through subprocess.Popen directly
+(waflib.Utils.run_regular_process). The command is 'cat' on a file of the
+given size, to measure the transfer of large compiler outputs.
+
+Usage:
+./prefork_bench.py [commands] [jobs] [output size in kB]
+
+For example:
+./prefork_bench.py 2000 8 64
+"""
+
+import os, sys, time, tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from waflib import Utils
+
+def bench(fun, n, j, cmd):
+	def run():
+		for i in range(n // j):
+			kw = {'stdout': Utils.subprocess.PIPE, 'stderr': Utils.subprocess.PIPE}
+			ret, out, err = fun(cmd, kw, {})
+			assert ret == 0 and len(out) == size
+
+	threads = [Utils.threading.Thread(target=run) for i in range(j)]
+	t = time.time()
+	for x in threads:
+		x.start()
+	for x in threads:
+		x.join()
+	return time.time() - t
+
+if __name__ == '__main__':
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+	j = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+	size = 1024 * int(sys.argv[3]) if len(sys.argv) > 3 else 65536
+
+	(fd, tmp) = tempfile.mkstemp()
+	os.write(fd, b'x' * size)
+	os.close(fd)
+	try:
+		Utils.alloc_process_pool(j)
+		cmd = ['cat', tmp]
+		for (name, fun) in (('regular', Utils.run_regular_process), ('prefork', Utils.run_prefork_process)):
+			d = bench(fun, n, j, cmd)
+			print('%s %d commands -j%d %dkB: %.3fs, %.1fus per command' % (name.ljust(8), n, j, size // 1024, d, 1000000 * d / n))
+	finally:
+		os.remove(tmp)
@@ -0,0 +1,99 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+"""
+Measures the time spent by the c/c++ preprocessor (waflib.Tools.c_preproc)
+to scan the files of a project created by genbench.py, and the cost
+of evaluating typical #if conditions, with and without the token caches.
+
+Usage:
+./preproc_bench.py <folder created by genbench.py> [iterations]
+
+For example:
+./genbench.py /tmp/build 50 100 15 5
+./preproc_bench.py /tmp/build
+"""
+
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from waflib import Context, ConfigSet, Utils
+from waflib.Tools import c_preproc
+
+CONDITIONS = [
+	'0',
+	'HAVE_CONFIG_H',
+	'defined(__cplusplus)',
+	'!defined(NDEBUG)',
+	'defined(_WIN32) || defined(__CYGWIN__)',
+	'__GNUC__ > 4 || (__GNUC__ == 4 && __GNUC_MINOR__ >= 7)',
+	'VERSION_CHECK(2, 6) && !defined(NO_THREADS)',
+	'(FLAGS & 0x10) != 0 ? LEVEL << 2 : -LEVEL / 3',
+]
+
+DEFINES = {
+	'__cplusplus': '__cplusplus 201103L',
+	'__GNUC__': '__GNUC__ 4',
+	'__GNUC_MINOR__': '__GNUC_MINOR__ 9',
+	'FLAGS': 'FLAGS 0x11',
+	'LEVEL': 'LEVEL 5',
+	'VERSION': 'VERSION 0x20700',
+	'VERSION_CHECK': 'VERSION_CHECK(a, b) (VERSION >= ((a) << 16 | (b) << 8))',
+}
+
+def clear_caches(ctx):
+	c_preproc.tokenize_cache = Utils.lru_cache(10000)
+	c_preproc.macro_cache = Utils.lru_cache(10000)
+	for x in ('preproc_cache_node', 'preproc_cache_lines', 'preproc_cache_closures'):
+		try:
+			delattr(ctx, x)
+		except AttributeError:
+			pass
+
+def scan(ctx, top, files):
+	count = 0
+	for node in files:
+		parser = c_preproc.c_parser([top])
+		parser.start(node, ctx.env)
+		count += len(parser.nodes)
+	return count
+
+def evaluate(count):
+	for i in range(count):
+		for x in CONDITIONS:
+			c_preproc.eval_macro(c_preproc.tokenize(x), dict(DEFINES))
+
+if __name__ == '__main__':
+	if len(sys.argv) < 2:
+		print(__doc__)
+		sys.exit(1)
+	iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+	ctx = Context.Context(run_dir=os.getcwd())
+	ctx.env = ConfigSet.ConfigSet()
+	top = ctx.srcnode = ctx.root.find_dir(os.path.abspath(sys.argv[1]))
+	ctx.bldnode = top.make_node('build')
+	files = top.ant_glob('**/*.cpp')
+	print('%d files' % len(files))
+
+	for cold in (True, False):
+		total = 0
+		for i in range(iterations):
+			if cold:
+				clear_caches(ctx)
+			t = time.time()
+			deps = scan(ctx, top, files)
+			total += time.time() - t
+		print('scan (%s caches): %.3fs, %d dependencies' % (cold and 'cold' or 'warm', total / iterations, deps))
+
+	for cold in (True, False):
+		if cold:
+			# caches holding a single element are always missed
+			c_preproc.tokenize_cache = Utils.lru_cache(1)
+			c_preproc.macro_cache = Utils.lru_cache(1)
+		else:
+			clear_caches(ctx)
+		t = time.time()
+		evaluate(2000)
+		d = time.time() - t
+		print('eval (%s caches): %.1fus per condition' % (cold and 'cold' or 'warm', d * 1e6 / (2000 * len(CONDITIONS))))
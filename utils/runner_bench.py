@@ -0,0 +1,89 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+"""
+Measures the per-task dispatch overhead of waflib.Runner.Parallel on tasks doing nothing,
+using the pool of consumer threads and the former scheme creating one thread per task.
+
+Usage:
+./runner_bench.py [tasks] [jobs]
+
+For example:
+./runner_bench.py 20000 8
+"""
+
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from waflib import Runner, Task, Utils
+
+class nop(Task.TaskBase):
+	def run(self):
+		return 0
+
+class fake_bld(object):
+	keep = 0
+	progress_bar = 3
+	def __init__(self, n):
+		self.task_sigs = {}
+		self.tasks = [nop(bld=self) for x in range(n)]
+		for x in self.tasks:
+			x.bld = self
+	def total(self):
+		return len(self.tasks)
+
+class OneShotConsumer(Utils.threading.Thread):
+	"""Former consumer: one thread per task"""
+	def __init__(self, spawner, task):
+		Utils.threading.Thread.__init__(self)
+		self.task = task
+		self.spawner = spawner
+		self.setDaemon(1)
+		self.start()
+	def run(self):
+		try:
+			if not self.spawner.master.stop:
+				self.task.process()
+		finally:
+			self.spawner.sem.release()
+			self.spawner.master.out.put(self.task)
+
+class OneShotSpawner(Utils.threading.Thread):
+	"""Former spawner: waits on a semaphore and creates a thread for each task"""
+	def __init__(self, master):
+		Utils.threading.Thread.__init__(self)
+		self.master = master
+		self.sem = Utils.threading.Semaphore(master.numjobs)
+		self.setDaemon(1)
+		self.start()
+	def run(self):
+		while 1:
+			task = self.master.ready.get()
+			if task is None:
+				break
+			self.sem.acquire()
+			OneShotConsumer(self, task)
+
+def bench(n, j, spawner):
+	bld = fake_bld(n)
+	def it():
+		yield bld.tasks
+		while 1:
+			yield []
+	old = Runner.Spawner
+	Runner.Spawner = spawner
+	try:
+		t = time.time()
+		bld.producer = Runner.Parallel(bld, j)
+		bld.producer.biter = it()
+		bld.producer.start()
+		return time.time() - t
+	finally:
+		Runner.Spawner = old
+
+if __name__ == '__main__':
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+	j = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+	for (name, spawner) in (('thread per task', OneShotSpawner), ('thread pool', Runner.Spawner)):
+		d = min(bench(n, j, spawner) for x in range(3))
+		print('%-16s %d tasks -j%d: %.3fs, %.1fus per task' % (name, n, j, d, 1e6 * d / n))
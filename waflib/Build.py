@@ -9,7 +9,7 @@ The inheritance tree is the following:
 
 """
 
-import os, sys, errno, re, shutil, stat
+import os, sys, errno, re, shutil, stat, struct, binascii
 try:
 	import cPickle
 except ImportError:
@@ -28,14 +28,68 @@ INSTALL = 1337
 UNINSTALL = -1337
 """Negative value '<-' uninstall, see :py:attr:`waflib.Build.BuildContext.is_install`"""
 
-SAVED_ATTRS = 'root node_sigs task_sigs imp_sigs raw_deps node_deps'.split()
+SAVED_ATTRS = 'root node_sigs task_sigs imp_sigs raw_deps node_deps task_durations file_hashes scan_cache compiler_deps dep_paths'.split()
 """Build class members to save between the runs; these should be all dicts
 except for `root` which represents a :py:class:`waflib.Node.Node` instance
 """
 
+PARTITIONED_ATTRS = 'task_sigs imp_sigs raw_deps node_deps task_durations scan_cache compiler_deps'.split()
+"""Build class members keyed by task identifiers, which are stored by folder of task generator
+in the build cache and loaded on demand, see :py:meth:`waflib.Build.BuildContext.load_partition`
+"""
+
+SEPARATE_ATTRS = ['scan_cache']
+"""Build class members from :py:const:`waflib.Build.PARTITIONED_ATTRS` that are not keyed by task identifiers;
+each is stored in a partition named after the attribute, loaded with ``bld.load_partition(name)``
+"""
+
+DURATIONS = 5
+"""Amount of task durations to keep for each task in :py:attr:`waflib.Build.BuildContext.task_durations`"""
+
+FILE_ATTRS = ['file_hashes', 'scan_cache']
+"""Build class members keyed by nodes, whose entries are kept in the build cache as long as the files exist
+(including when the current build does not use them, ``waf --targets=x`` for example)"""
+
+MIN_HASH_NODES = 16
+"""Minimum amount of files per thread for computing the file signatures in parallel, see :py:meth:`waflib.Build.BuildContext.hash_nodes`"""
+
+MIN_SCAN_TASKS = 8
+"""Minimum amount of tasks per worker process for scanning the dependencies in parallel, see :py:meth:`waflib.Build.BuildContext.scan_tasks`"""
+
 CFG_FILES = 'cfg_files'
 """Files from the build directory to hash before starting the build (``config.h`` written during the configuration)"""
 
+JOURNAL = '.log'
+"""Suffix of the journal file of the build cache, see :py:meth:`waflib.Build.BuildContext.store`"""
+
+JOURNAL_RATIO = 0.25
+"""The build cache is written again entirely when its journal exceeds this fraction of its size"""
+
+JOURNAL_HEADER = '!cII'
+"""Header of the records of the journal of the build cache: record kind (1 byte, 'G' for the generation
+of the build cache and 'J' for the modified entries), payload size and crc32 of the payload"""
+
+NULL_SUFFIX = '_null.pickle'
+"""Files written under :py:attr:`waflib.Build.CACHE_DIR` to record the file status of the last build of a variant
+that executed no task, see :py:meth:`waflib.Build.BuildContext.is_null_build`"""
+
+GRAPH_SUFFIX = '_graph.pickle'
+"""Files written under :py:attr:`waflib.Build.CACHE_DIR` to store the task generators posted by the last build
+of a variant, see :py:meth:`waflib.Build.BuildContext.load_graph`"""
+
+BUILD_KEY_VARS = ['PATH']
+"""Environment variables whose changes prevent the reuse of the null builds and of the task graphs.
+The variables read by the scripts may be added in the top-level wscript file, for example::
+
+	build_key_vars = ['FOO_VERSION']
+
+The other variables (``OLDPWD``, ``SHLVL``, ...) are ignored, and the values stored in the configuration
+(``env.PATH``, ``env.env``) are taken into account through the configuration files.
+"""
+
+GRAPH_ATTRS = 'groups group_names current_group deps_man'.split()
+"""Build class members stored with the task graph, in addition to the ones set by the scripts"""
+
 POST_AT_ONCE = 0
 """Post mode: all task generators are posted before any task executed"""
 
@@ -46,6 +100,157 @@ PROTOCOL = -1
 if sys.platform == 'cli':
 	PROTOCOL = 0
 
+def write_record(f, kind, data):
+	"""
+	Writes a record to the journal of the build cache, see :py:const:`waflib.Build.JOURNAL_HEADER`
+	"""
+	f.write(struct.pack(JOURNAL_HEADER, kind, len(data), binascii.crc32(data) & 0xffffffff))
+	f.write(data)
+
+def read_record(f):
+	"""
+	Reads a record from the journal of the build cache, see :py:const:`waflib.Build.JOURNAL_HEADER`
+
+	:return: a tuple (kind, payload)
+	:raise: IOError if the record is incomplete or corrupted
+	"""
+	size = struct.calcsize(JOURNAL_HEADER)
+	head = f.read(size)
+	if len(head) < size:
+		raise IOError('Incomplete record')
+	kind, size, crc = struct.unpack(JOURNAL_HEADER, head)
+	data = f.read(size)
+	if len(data) < size or binascii.crc32(data) & 0xffffffff != crc:
+		raise IOError('Invalid record')
+	return (kind, data)
+
+class journal_dict(dict):
+	"""
+	Dict recording the keys modified since the build cache was loaded, so that only the modified
+	entries are written to the journal (see :py:meth:`waflib.Build.BuildContext.store_journal`).
+
+	The values that are lists, dicts or sets are copied when they are read, and compared to the copies
+	when the journal is written, so that the values modified in place (``bld.raw_deps[uid].append(x)``)
+	are recorded too. Only the first level is compared: the values nested in these containers
+	must be replaced instead of being modified, and the values obtained by iterating over the dict
+	(``values()``, ``items()``) must not be modified in place.
+	"""
+	def __init__(self, *k, **kw):
+		dict.__init__(self, *k, **kw)
+		self.changed = set()
+		"""Keys modified"""
+		self.read = {}
+		"""Dict mapping the keys read to copies of their mutable values, see :py:meth:`waflib.Build.journal_dict.get_changed`"""
+		self.full = False
+		"""Whether all the data must be written"""
+	def __getitem__(self, key):
+		ret = dict.__getitem__(self, key)
+		if type(ret) in (list, dict, set) and not key in self.read:
+			self.read[key] = type(ret)(ret)
+		return ret
+	def get(self, key, default=None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+	def get_changed(self):
+		"""
+		:return: the keys assigned or removed, and the keys whose values were modified in place
+		:rtype: set
+		"""
+		ret = set(self.changed)
+		for (k, v) in self.read.items():
+			if not k in ret and dict.get(self, k) != v:
+				ret.add(k)
+		return ret
+	def __setitem__(self, key, value):
+		self.changed.add(key)
+		dict.__setitem__(self, key, value)
+	def __delitem__(self, key):
+		dict.__delitem__(self, key)
+		self.changed.add(key)
+	def pop(self, key, *k):
+		self.changed.add(key)
+		return dict.pop(self, key, *k)
+	def popitem(self):
+		ret = dict.popitem(self)
+		self.changed.add(ret[0])
+		return ret
+	def setdefault(self, key, default=None):
+		self.changed.add(key)
+		return dict.setdefault(self, key, default)
+	def update(self, *k, **kw):
+		tmp = dict(*k, **kw)
+		self.changed.update(tmp)
+		dict.update(self, tmp)
+	def clear(self):
+		dict.clear(self)
+		self.full = True
+
+class node_ref(object):
+	"""
+	Reference to a node in the journal of the build cache, see :py:meth:`waflib.Build.BuildContext.encode_db`
+	"""
+	__slots__ = ('names',)
+	def __init__(self, names):
+		self.names = names
+	def __reduce__(self):
+		return (node_ref, (self.names,))
+
+def file_status(path):
+	"""
+	:return: a tuple (modification time, size, inode) representing the state of a file or folder, or None if it does not exist
+	"""
+	try:
+		st = os.stat(path)
+	except OSError:
+		return None
+	return (st.st_mtime, st.st_size, st.st_ino)
+
+def folder_status(path):
+	"""
+	:return: a hash of the names of the files in a folder, or None if it does not exist
+	"""
+	try:
+		return Utils.h_list(sorted(Utils.listdir(path)))
+	except OSError:
+		return None
+
+class graph_buffer(list):
+	"""
+	Buffer receiving the pickled task graph, see :py:meth:`waflib.Build.BuildContext.dump_graph`
+	"""
+	write = list.append
+
+def make_pickler(f, bld):
+	"""
+	Creates a pickler that replaces the build context by a persistent reference, see :py:func:`waflib.Build.make_unpickler`
+	"""
+	if isinstance(cPickle.Pickler, type):
+		class pickler(cPickle.Pickler):
+			def persistent_id(self, obj):
+				if obj is bld:
+					return 'bld'
+				return None
+		return pickler(f, PROTOCOL)
+	# cPickle on Python 2
+	ret = cPickle.Pickler(f, PROTOCOL)
+	ret.persistent_id = lambda obj: obj is bld and 'bld' or None
+	return ret
+
+def make_unpickler(f, bld):
+	"""
+	Creates an unpickler that restores the references to the build context, see :py:func:`waflib.Build.make_pickler`
+	"""
+	if isinstance(cPickle.Unpickler, type):
+		class unpickler(cPickle.Unpickler):
+			def persistent_load(self, pid):
+				return bld
+		return unpickler(f)
+	ret = cPickle.Unpickler(f)
+	ret.persistent_load = lambda pid: bld
+	return ret
+
 class BuildContext(Context.Context):
 	'''executes the build'''
 
@@ -98,6 +303,32 @@ class BuildContext(Context.Context):
 		self.raw_deps = {}
 		"""Dict mapping task identifiers (uid) to custom data returned by :py:meth:`waflib.Task.Task.scan` (persists across builds)"""
 
+		self.task_durations = {}
+		"""Dict mapping task identifiers (uid) to the lists of the last durations of successful task executions in seconds,
+		see :py:meth:`waflib.Build.BuildContext.add_task_duration` (persists across builds)"""
+
+		self.file_hashes = {}
+		"""Dict mapping nodes to tuples (file status, file hash), see :py:meth:`waflib.Node.Node.h_file_cached` (persists across builds)"""
+
+		self.scan_cache = {}
+		"""Dict mapping nodes to tuples (file signature, data extracted by the scanners), for example the preprocessor directives
+		of the c/c++ headers (see :py:meth:`waflib.Tools.c_preproc.c_parser.parse_lines`); it is loaded on first use
+		by ``bld.load_partition('scan_cache')`` (persists across builds)"""
+
+		self.compiler_deps = {}
+		"""Dict mapping task identifiers to the dependencies reported by the compilers, as binary arrays of indices
+		in :py:attr:`waflib.Build.BuildContext.dep_paths` (see :py:mod:`waflib.Tools.c_deps`, persists across builds)"""
+
+		self.dep_paths = {}
+		"""Dict mapping indices to the absolute paths of the dependencies reported by the compilers (persists across builds)"""
+
+		self.db_parts = {}
+		"""Dict mapping task generator folders to the serialized entries of :py:const:`waflib.Build.PARTITIONED_ATTRS`
+		that were not loaded yet, see :py:meth:`waflib.Build.BuildContext.load_partition`"""
+
+		self.db_loaded = {}
+		"""Dict mapping task generator folders to the keys loaded from the build cache"""
+
 		self.task_gen_cache_names = {}
 
 		self.jobs = Options.options.jobs
@@ -109,6 +340,45 @@ class BuildContext(Context.Context):
 		self.keep = Options.options.keep
 		"""Whether the build should continue past errors"""
 
+		self.prio = Options.options.prio
+		"""Whether to execute the tasks on the critical path first, see :py:attr:`waflib.Runner.Parallel.prio`"""
+
+		self.pipeline = Options.options.pipeline
+		"""
+		Whether the tasks from the next build groups may be executed before the current build group is complete.
+		The build groups then only constrain the order in which the task generators are posted,
+		see :py:meth:`waflib.Build.BuildContext.get_build_iterator`
+		"""
+
+		self.mem_budget = Options.options.mem_budget
+		"""Memory available for the tasks in MB (0 for no limit), see :py:meth:`waflib.Runner.Parallel.get_resources`"""
+
+		self.hash_cache = Options.options.hash_cache
+		"""Whether to reuse the hashes of the files that did not change since the previous build, see :py:meth:`waflib.Node.Node.h_file_cached`"""
+
+		self.scan_pool = Options.options.scan_pool
+		"""Whether to scan the dependencies of the tasks in worker processes, see :py:meth:`waflib.Build.BuildContext.scan_tasks`"""
+
+		self.scan_pending = None
+		"""List of tasks whose dependencies must be scanned, set by :py:meth:`waflib.Build.BuildContext.scan_tasks`"""
+
+		self.scan_results = {}
+		"""Dict mapping task identifiers to the dependencies found by the worker processes, see :py:meth:`waflib.Build.BuildContext.scan_tasks`"""
+
+		self.null_check = Options.options.null_check
+		"""Whether to return immediately when no file changed since the last build that executed no task,
+		see :py:meth:`waflib.Build.BuildContext.is_null_build`"""
+
+		self.reuse_graph = Options.options.reuse_graph
+		"""Whether to reuse the task generators posted by the previous build instead of executing the scripts,
+		see :py:meth:`waflib.Build.BuildContext.load_graph`"""
+
+		self.graph_pickler = None
+		"""Pickler storing the build groups as they are posted, see :py:meth:`waflib.Build.BuildContext.dump_graph`"""
+
+		self.loaded_tools = []
+		"""Arguments of the calls to :py:meth:`waflib.Build.BuildContext.load`, repeated when the task graph is reused"""
+
 		self.progress_bar = Options.options.progress_bar
 		"""
 		Level of progress status:
@@ -249,11 +519,308 @@ class BuildContext(Context.Context):
 		Restore data from previous builds and call :py:meth:`waflib.Build.BuildContext.execute_build`.
 		Overrides from :py:func:`waflib.Context.Context.execute`
 		"""
+		null_check = self.null_check and not self.is_install
+		if null_check:
+			if self.is_null_build():
+				Logs.info("Waf: Nothing to do in `%s'", self.variant_dir)
+				return
+			try:
+				os.remove(self.null_build_file())
+			except OSError:
+				pass
+
 		self.restore()
 		if not self.all_envs:
 			self.load_envs()
 		self.execute_build()
 
+		if null_check and getattr(self, 'null_build', False):
+			self.store_null_build()
+
+	def null_build_file(self):
+		"""
+		:return: the path of the file recording the status of the files used by the last null build of the variant
+		"""
+		return os.path.join(self.cache_dir, self.variant + NULL_SUFFIX)
+
+	def get_build_key(self):
+		"""
+		Null builds and task graphs are only reused for identical waf versions, Python interpreters,
+		commands, launch folders, command-line options and environment variables
+		(see :py:const:`waflib.Build.BUILD_KEY_VARS`)
+
+		:return: a hash of the values that must not change between two builds
+		:rtype: bytes
+		"""
+		# the options changing the console output or the amount of jobs do not matter
+		opts = [x for x in vars(Options.options).items() if not x[0] in ('jobs', 'verbose', 'zones', 'colors', 'progress_bar')]
+		names = set(BUILD_KEY_VARS)
+		names.update(Utils.to_list(getattr(Context.g_module, 'build_key_vars', [])))
+		envs = [(x, os.environ.get(x)) for x in sorted(names)]
+		lst = [Context.HEXVERSION, sys.executable, sys.version, self.cmd, self.variant, self.top_dir, self.out_dir,
+			self.launch_dir, sorted(opts), envs]
+		return Utils.h_list(lst)
+
+	def is_null_build(self):
+		"""
+		Checks whether all the files recorded by :py:meth:`waflib.Build.BuildContext.store_null_build`
+		are unchanged, in which case the build would execute no task. The build cache,
+		the tools and the scripts are not loaded, so this is much faster than a regular build
+		on large projects, but the functions added by :py:meth:`waflib.Build.BuildContext.add_pre_fun`
+		and :py:meth:`waflib.Build.BuildContext.add_post_fun` are not executed.
+		Enable with ``waf --null-check``.
+
+		:rtype: bool
+		"""
+		try:
+			key, lst = cPickle.loads(Utils.readf(self.null_build_file(), 'rb'))
+		except Exception:
+			return False
+		if key != self.get_build_key():
+			return False
+		for (path, st) in lst:
+			if file_status(path) != st:
+				Logs.debug('build: %r changed since the last null build', path)
+				return False
+		return True
+
+	def store_null_build(self):
+		"""
+		Records the status of the files used by a build that executed no task:
+		the scripts and the Python modules loaded, the configuration files, the task inputs,
+		outputs and dependencies, and the source folders (to detect the files added for
+		:py:meth:`waflib.Node.Node.ant_glob`)
+		"""
+		paths, folders = self.get_script_files()
+		paths.update(folders)
+		dbfn = os.path.join(self.variant_dir, Context.DBFILE)
+		paths.add(dbfn)
+		paths.add(dbfn + JOURNAL)
+
+		nodes = set()
+		for g in self.groups:
+			for tg in g:
+				if isinstance(tg, Task.TaskBase):
+					lst = [tg]
+				else:
+					lst = getattr(tg, 'tasks', [])
+				for tsk in lst:
+					nodes.update(getattr(tsk, 'inputs', []))
+					nodes.update(getattr(tsk, 'outputs', []))
+					nodes.update(getattr(tsk, 'dep_nodes', []))
+					try:
+						nodes.update(tsk.get_implicit_nodes())
+					except AttributeError:
+						pass
+		for lst in self.deps_man.values():
+			nodes.update(x for x in lst if isinstance(x, Node.Node))
+		paths.update(x.abspath() for x in nodes)
+
+		lst = [(x, file_status(x)) for x in sorted(paths)]
+		self.write_cache_file(self.null_build_file(), (self.get_build_key(), lst))
+
+	def write_cache_file(self, fn, data):
+		"""
+		Writes a pickled object atomically; the errors are ignored as the file is only an optimization
+		"""
+		try:
+			Utils.writef(fn + '.tmp', cPickle.dumps(data, PROTOCOL), m='wb')
+			try:
+				os.remove(fn)
+			except OSError:
+				pass
+			os.rename(fn + '.tmp', fn)
+		except EnvironmentError as e:
+			Logs.debug('build: Could not write %r: %r', fn, e)
+
+	def get_script_files(self):
+		"""
+		:return: the paths of the scripts and Python modules loaded, of the configuration files,
+			and of the source folders that were listed or traversed
+		:rtype: tuple of two sets
+		"""
+		paths = set()
+		for x in getattr(self, 'recurse_cache', {}):
+			if isinstance(x, tuple):
+				x = x[0]
+			paths.add(x.abspath())
+		paths.update(Context.cache_modules)
+
+		prefixes = tuple(set(os.path.realpath(x) for x in (sys.prefix, sys.exec_prefix, getattr(sys, 'base_prefix', sys.prefix))))
+		for m in list(sys.modules.values()):
+			f = getattr(m, '__file__', None)
+			if f and not os.path.realpath(f).startswith(prefixes):
+				if f.endswith(('.pyc', '.pyo')):
+					f = f[:-1]
+				paths.add(os.path.abspath(f))
+
+		for x in Utils.listdir(self.cache_dir):
+			if not x.endswith((NULL_SUFFIX, GRAPH_SUFFIX)):
+				paths.add(os.path.join(self.cache_dir, x))
+		for x in (self.top_dir, self.out_dir, self.run_dir):
+			paths.add(os.path.join(x, Options.lockfile))
+
+		# the folders listed; the build directory changes on each build
+		folders = set()
+		skip = set([self.root.find_node(self.out_dir), self.root.find_node(self.cache_dir), self.bldnode])
+		skip.discard(self.srcnode)
+		todo = [self.srcnode]
+		while todo:
+			node = todo.pop()
+			if node in skip:
+				continue
+			try:
+				children = node.children
+			except AttributeError:
+				continue
+			folders.add(node.abspath())
+			todo.extend(children.values())
+		return (paths, folders)
+
+	def load(self, *k, **kw):
+		"""
+		Same as :py:meth:`waflib.Context.Context.load`; the calls are recorded so that the tools
+		are loaded again when the task graph is reused, see :py:meth:`waflib.Build.BuildContext.load_graph`
+		"""
+		self.loaded_tools.append((k, kw))
+		super(BuildContext, self).load(*k, **kw)
+
+	def graph_file(self):
+		"""
+		:return: the path of the file storing the task graph of the variant
+		"""
+		return os.path.join(self.cache_dir, self.variant + GRAPH_SUFFIX)
+
+	def load_graph(self):
+		"""
+		Restores the task generators and the tasks posted by the previous build instead of executing
+		the scripts. The task graph is reused only if the scripts, the Python modules, the configuration,
+		the command-line options and the contents of the source folders listed are unchanged.
+		The tools loaded by the scripts (``bld.load``) are loaded again, and the attributes they set
+		have precedence over the ones restored.
+
+		The task graph is not stored if any object cannot be pickled (functions defined in the scripts for example),
+		and the files read by the scripts themselves are not tracked, so this must be enabled explicitly
+		with ``waf --reuse-graph``.
+
+		:return: True if the task graph was restored
+		:rtype: bool
+		"""
+		try:
+			f = open(self.graph_file(), 'rb')
+		except EnvironmentError:
+			return False
+		try:
+			try:
+				key, count, files, folders = cPickle.load(f)
+				if key != self.get_build_key():
+					return False
+				for (path, st) in files:
+					if file_status(path) != st:
+						Logs.debug('build: %r changed since the task graph was stored', path)
+						return False
+				for (path, st) in folders:
+					if folder_status(path) != st:
+						Logs.debug('build: the contents of %r changed since the task graph was stored', path)
+						return False
+
+				u = make_unpickler(f, self)
+				Node.pickle_lock.acquire()
+				try:
+					Node.pickle_nodes = [self.root]
+					for x in range(count + 1):
+						state = u.load()
+				finally:
+					Node.pickle_nodes = None
+					Node.pickle_lock.release()
+			except Exception as e:
+				Logs.debug('build: Could not load the task graph: %r', e)
+				return False
+		finally:
+			f.close()
+
+		for (k, kw) in state.pop('loaded_tools'):
+			self.load(*k, **kw)
+		for (x, v) in state.items():
+			if x in GRAPH_ATTRS or not x in self.__dict__:
+				setattr(self, x, v)
+
+		for g in self.groups:
+			for tg in g:
+				if isinstance(tg, Task.TaskBase):
+					self.load_partition(getattr(getattr(tg, 'generator', None), 'path', None))
+				elif getattr(tg, 'posted', None):
+					self.load_partition(tg.path)
+		Logs.debug('build: reusing the task graph of the previous build')
+		return True
+
+	def dump_graph(self):
+		"""
+		Pickles the task generators of the current build group, right after they are posted
+		and before their tasks are executed. The pickler keeps the objects already pickled
+		with the previous groups, so that the references across the groups are preserved.
+		"""
+		if not self.graph_pickler:
+			return
+		try:
+			Node.pickle_lock.acquire()
+			try:
+				Node.pickle_index = {self.root: 0}
+				self.graph_pickler.dump(self.groups[self.cur])
+			finally:
+				Node.pickle_index = None
+				Node.pickle_lock.release()
+		except Exception as e:
+			Logs.debug('build: The task graph cannot be stored: %r', e)
+			self.graph_pickler = None
+		else:
+			self.graph_count += 1
+
+	def store_graph(self):
+		"""
+		Writes the task graph pickled during the build along with the build class members set by the scripts,
+		see :py:meth:`waflib.Build.BuildContext.load_graph`
+		"""
+		if not self.graph_pickler:
+			return
+		state = dict((x, getattr(self, x)) for x in self.graph_attrs if hasattr(self, x))
+		state['loaded_tools'] = self.loaded_tools
+		try:
+			Node.pickle_lock.acquire()
+			try:
+				Node.pickle_index = {self.root: 0}
+				self.graph_pickler.dump(state)
+			finally:
+				Node.pickle_index = None
+				Node.pickle_lock.release()
+		except Exception as e:
+			Logs.debug('build: The task graph cannot be stored: %r', e)
+			return
+		finally:
+			self.graph_pickler = None
+
+		files, folders = self.get_script_files()
+		header = (self.get_build_key(), self.graph_count,
+			[(x, file_status(x)) for x in sorted(files)],
+			[(x, folder_status(x)) for x in sorted(folders)])
+		fn = self.graph_file()
+		try:
+			f = open(fn + '.tmp', 'wb')
+			try:
+				f.write(cPickle.dumps(header, PROTOCOL))
+				for x in self.graph_data:
+					f.write(x)
+			finally:
+				f.close()
+			try:
+				os.remove(fn)
+			except OSError:
+				pass
+			os.rename(fn + '.tmp', fn)
+		except EnvironmentError as e:
+			Logs.debug('build: Could not write %r: %r', fn, e)
+		del self.graph_data
+
 	def execute_build(self):
 		"""
 		Execute the build by:
@@ -265,7 +832,19 @@ class BuildContext(Context.Context):
 		"""
 
 		Logs.info("Waf: Entering directory `%s'", self.variant_dir)
-		self.recurse([self.run_dir])
+		if not (self.reuse_graph and self.load_graph()):
+			if self.reuse_graph:
+				try:
+					os.remove(self.graph_file())
+				except OSError:
+					pass
+			before = set(self.__dict__)
+			self.recurse([self.run_dir])
+			if self.reuse_graph:
+				self.graph_attrs = [x for x in self.__dict__ if not x in before] + GRAPH_ATTRS
+				self.graph_data = graph_buffer()
+				self.graph_count = 0
+				self.graph_pickler = make_pickler(self.graph_data, self)
 		self.pre_build()
 
 		# display the time elapsed in the progress bar
@@ -279,7 +858,10 @@ class BuildContext(Context.Context):
 				m = self.progress_line(c, c, Logs.colors.BLUE, Logs.colors.NORMAL)
 				Logs.info(m, extra={'stream': sys.stderr, 'c1': Logs.colors.cursor_off, 'c2' : Logs.colors.cursor_on})
 			Logs.info("Waf: Leaving directory `%s'", self.variant_dir)
+		self.store_graph()
 		try:
+			# no task executed, see BuildContext.store_null_build
+			self.null_build = not self.producer.dirty
 			self.producer.bld = None
 			del self.producer
 		except AttributeError:
@@ -288,7 +870,8 @@ class BuildContext(Context.Context):
 
 	def restore(self):
 		"""
-		Load data from a previous run, sets the attributes listed in :py:const:`waflib.Build.SAVED_ATTRS`
+		Load data from a previous run, sets the attributes listed in :py:const:`waflib.Build.SAVED_ATTRS`.
+		The data is discarded if it was computed with another hash algorithm, see :py:func:`waflib.Utils.set_hash`
 		"""
 		try:
 			env = ConfigSet.ConfigSet(os.path.join(self.cache_dir, 'build.config.py'))
@@ -297,6 +880,7 @@ class BuildContext(Context.Context):
 		else:
 			if env.version < Context.HEXVERSION:
 				raise Errors.WafError('Version mismatch! reconfigure the project')
+			Utils.set_hash(env.hash_algorithm or 'md5')
 			for t in env.tools:
 				self.setup(**t)
 
@@ -310,33 +894,281 @@ class BuildContext(Context.Context):
 			try:
 				Node.pickle_lock.acquire()
 				Node.Nod3 = self.node_class
+				size = len(data)
 				try:
-					data = cPickle.loads(data)
+					root, data = cPickle.loads(data)
 				except Exception as e:
 					Logs.debug('build: Could not pickle the build cache %s: %r', dbfn, e)
 				else:
-					for x in SAVED_ATTRS:
-						setattr(self, x, data.get(x, {}))
+					data['root'] = root
+					if data.get('hash_algorithm', 'md5') != Utils.hash_algorithm:
+						# the signatures cannot be compared
+						Logs.debug('build: Discarding the build cache %s (hash algorithm change)', dbfn)
+					else:
+						for x in SAVED_ATTRS:
+							setattr(self, x, data.get(x, {}))
+						self.db_generation = data.get('generation')
+						self.db_size = size
+						self.db_parts = data.get('parts', {})
+						self.db_nodes = Node.pickle_nodes
 			finally:
+				Node.pickle_nodes = None
 				Node.pickle_lock.release()
+			self.load_journal(dbfn)
+			# entries of the tasks without task generators
+			self.load_partition(None)
 
 		self.init_dirs()
 
+	def load_journal(self, dbfn):
+		"""
+		Applies the changes recorded by :py:meth:`waflib.Build.BuildContext.store` in the journal of the
+		build cache. The journal is ignored if it does not match the build cache, and the data following
+		an incomplete or corrupted record (interrupted build) is discarded.
+
+		:param dbfn: path to the build cache
+		:type dbfn: string
+		"""
+		for x in SAVED_ATTRS:
+			if x != 'root':
+				setattr(self, x, journal_dict(getattr(self, x)))
+		self.journal_size = 0
+		self.db_overlay = {}
+
+		try:
+			f = open(dbfn + JOURNAL, 'rb')
+		except EnvironmentError:
+			return
+		size = 0
+		try:
+			try:
+				kind, data = read_record(f)
+				if kind != b'G' or data != self.db_generation:
+					Logs.debug('build: Ignoring the journal %s (obsolete)', dbfn + JOURNAL)
+					return
+				size = f.tell()
+				while 1:
+					kind, data = read_record(f)
+					if kind != b'J':
+						raise IOError('Invalid record')
+					for (attr, key, present, value) in cPickle.loads(data):
+						try:
+							d = getattr(self, attr)
+						except AttributeError:
+							continue
+						key = self.decode_db(key)
+						if attr in PARTITIONED_ATTRS:
+							# newer than the partitions loaded afterwards
+							self.db_overlay.setdefault(attr, set()).add(key)
+						if present:
+							dict.__setitem__(d, key, self.decode_db(value))
+						else:
+							dict.pop(d, key, None)
+					size = f.tell()
+			except Exception as e:
+				if size and f.tell() > size:
+					Logs.debug('build: Discarding the end of the journal %s: %r', dbfn + JOURNAL, e)
+		finally:
+			f.close()
+		self.journal_size = size
+
+	def load_partition(self, node):
+		"""
+		Loads the entries of :py:const:`waflib.Build.PARTITIONED_ATTRS` for the tasks of the task generators
+		from a given folder. This is called when a task generator is posted, so that targeted builds
+		(``waf --targets=x``) only deserialize the data of the task generators they use.
+		The entries are not loaded into the dicts that were replaced or cleared since the build cache was read.
+
+		:param node: task generator folder, None for the tasks without task generators, or a name from :py:const:`waflib.Build.SEPARATE_ATTRS`
+		:type node: :py:class:`waflib.Node.Node` or string
+		"""
+		try:
+			data = self.db_parts.pop(node)
+		except KeyError:
+			return
+		try:
+			Node.pickle_lock.acquire()
+			Node.Nod3 = self.node_class
+			Node.pickle_nodes = self.db_nodes
+			data = cPickle.loads(data)
+		finally:
+			Node.pickle_nodes = None
+			Node.pickle_lock.release()
+
+		keys = self.db_loaded[node] = []
+		for (attr, entries) in data.items():
+			keys.extend(entries)
+			d = getattr(self, attr, None)
+			if not isinstance(d, journal_dict) or d.full:
+				continue
+			overlay = self.db_overlay.get(attr, ())
+			for (k, v) in entries.items():
+				if not k in overlay:
+					dict.__setitem__(d, k, v)
+
+	def partition_db(self):
+		"""
+		Groups the entries of :py:const:`waflib.Build.PARTITIONED_ATTRS` by folder of the task generators
+		of the tasks, for :py:meth:`waflib.Build.BuildContext.store`. The entries of tasks that are not part
+		of the current build remain in the folder they were loaded from.
+
+		:return: a dict mapping folders (or None) to dicts of attributes names and entries
+		:rtype: dict
+		"""
+		owners = {}
+		for (node, keys) in self.db_loaded.items():
+			for k in keys:
+				owners[k] = node
+		for g in self.groups:
+			for x in g:
+				if isinstance(x, TaskGen.task_gen):
+					for tsk in getattr(x, 'tasks', []):
+						owners[tsk.uid()] = x.path
+				else:
+					owners[x.uid()] = getattr(getattr(x, 'generator', None), 'path', None)
+
+		parts = {}
+		for attr in PARTITIONED_ATTRS:
+			for (k, v) in getattr(self, attr).items():
+				if attr in SEPARATE_ATTRS:
+					node = attr
+				else:
+					node = owners.get(k)
+				try:
+					entries = parts[node]
+				except KeyError:
+					entries = parts[node] = {}
+				try:
+					entries[attr][k] = v
+				except KeyError:
+					entries[attr] = {k: v}
+		return parts
+
+	def encode_db(self, obj):
+		"""
+		Replaces the nodes in keys and values of the build cache by :py:class:`waflib.Build.node_ref` objects
+		so that the journal records do not contain the whole node tree
+		"""
+		if isinstance(obj, Node.Node):
+			names = []
+			while obj.parent:
+				names.append(obj.name)
+				obj = obj.parent
+			names.reverse()
+			return node_ref(names)
+		if type(obj) in (list, tuple):
+			return type(obj)([self.encode_db(x) for x in obj])
+		return obj
+
+	def decode_db(self, obj):
+		"""
+		Reverse of :py:meth:`waflib.Build.BuildContext.encode_db`
+		"""
+		if isinstance(obj, node_ref):
+			return self.root.make_node(obj.names)
+		if type(obj) in (list, tuple):
+			return type(obj)([self.decode_db(x) for x in obj])
+		return obj
+
+	def store_journal(self, db):
+		"""
+		Appends the entries modified since the build cache was loaded to its journal.
+		Called by :py:meth:`waflib.Build.BuildContext.store`.
+
+		:param db: path to the build cache
+		:type db: string
+		:return: False if the whole build cache must be written instead
+		:rtype: bool
+		"""
+		if not getattr(self, 'db_generation', None):
+			return False
+
+		changes = []
+		for x in SAVED_ATTRS:
+			if x == 'root':
+				continue
+			d = getattr(self, x)
+			if not isinstance(d, journal_dict) or d.full:
+				return False
+			for k in d.get_changed():
+				try:
+					v = dict.__getitem__(d, k)
+				except KeyError:
+					changes.append((x, self.encode_db(k), False, None))
+				else:
+					changes.append((x, self.encode_db(k), True, self.encode_db(v)))
+		if not changes:
+			return True
+
+		data = cPickle.dumps(changes, PROTOCOL)
+		if self.journal_size + len(data) > self.db_size * JOURNAL_RATIO:
+			return False
+
+		try:
+			f = open(db + JOURNAL, self.journal_size and 'r+b' or 'wb')
+		except EnvironmentError:
+			return False
+		try:
+			if self.journal_size:
+				# drop the incomplete records, if any
+				f.seek(self.journal_size)
+				f.truncate()
+			else:
+				write_record(f, b'G', self.db_generation)
+			write_record(f, b'J', data)
+			self.journal_size = f.tell()
+		finally:
+			f.close()
+
+		for x in SAVED_ATTRS:
+			if x != 'root':
+				d = getattr(self, x)
+				d.changed = set()
+				d.read = {}
+		return True
+
 	def store(self):
 		"""
-		Store data for next runs, set the attributes listed in :py:const:`waflib.Build.SAVED_ATTRS`. Uses a temporary
-		file to avoid problems on ctrl+c.
+		Store data for next runs, set the attributes listed in :py:const:`waflib.Build.SAVED_ATTRS`.
+		The modified entries are appended to a journal (see :py:meth:`waflib.Build.BuildContext.store_journal`),
+		and the whole data is written again when the journal exceeds :py:const:`waflib.Build.JOURNAL_RATIO`
+		times the size of the build cache. The entries of :py:const:`waflib.Build.FILE_ATTRS` are discarded
+		in this case for the files that do not exist anymore.
+		Uses a temporary file to avoid problems on ctrl+c.
 		"""
-		data = {}
+		db = os.path.join(self.variant_dir, Context.DBFILE)
+		if self.store_journal(db):
+			return
+
+		# the partition indices refer to the previous node table
+		for node in list(self.db_parts.keys()):
+			self.load_partition(node)
+
+		# removed or renamed files
+		for x in FILE_ATTRS:
+			d = getattr(self, x)
+			for k in [k for k in d if not os.path.exists(k.abspath())]:
+				del d[k]
+		parts = self.partition_db()
+
+		generation = os.urandom(16)
+		data = {'hash_algorithm': Utils.hash_algorithm, 'generation': generation}
 		for x in SAVED_ATTRS:
+			if x == 'root' or x in PARTITIONED_ATTRS:
+				continue
 			data[x] = getattr(self, x)
-		db = os.path.join(self.variant_dir, Context.DBFILE)
+			if isinstance(data[x], journal_dict):
+				data[x] = dict(data[x])
 
 		try:
 			Node.pickle_lock.acquire()
 			Node.Nod3 = self.node_class
-			x = cPickle.dumps(data, PROTOCOL)
+			# the node tree is pickled first, as a flat path table
+			tree = Node.flat_tree(self.root)
+			data['parts'] = dict((k, cPickle.dumps(v, PROTOCOL)) for (k, v) in parts.items())
+			x = cPickle.dumps((tree, data), PROTOCOL)
 		finally:
+			Node.pickle_index = None
 			Node.pickle_lock.release()
 
 		Utils.writef(db + '.tmp', x, m='wb')
@@ -352,6 +1184,24 @@ class BuildContext(Context.Context):
 		# do not use shutil.move (copy is not thread-safe)
 		os.rename(db + '.tmp', db)
 
+		# the previous journal, if any, does not match the new generation
+		try:
+			os.remove(db + JOURNAL)
+		except OSError:
+			pass
+		self.db_generation = generation
+		self.db_size = len(x)
+		self.journal_size = 0
+		self.db_overlay = {}
+		self.db_loaded = {}
+		for (node, entries) in parts.items():
+			keys = self.db_loaded[node] = []
+			for v in entries.values():
+				keys.extend(v)
+		for k in SAVED_ATTRS:
+			if k != 'root':
+				setattr(self, k, journal_dict(getattr(self, k)))
+
 	def compile(self):
 		"""
 		Run the build by creating an instance of :py:class:`waflib.Runner.Parallel`
@@ -487,6 +1337,55 @@ class BuildContext(Context.Context):
 		Logs.debug('envhash: %s %r', Utils.to_hex(ret), lst)
 		return ret
 
+	def add_task_duration(self, tsk, duration):
+		"""
+		Records the duration of a successful task execution in :py:attr:`waflib.Build.BuildContext.task_durations`,
+		keeping the last :py:const:`waflib.Build.DURATIONS` values. This method is called from the consumer
+		threads by :py:meth:`waflib.Runner.Parallel.add_duration`. Tasks without identifiers
+		(see :py:meth:`waflib.Task.TaskBase.uid`) are ignored.
+
+		:param tsk: task instance
+		:type tsk: :py:class:`waflib.Task.TaskBase`
+		:param duration: execution time in seconds
+		:type duration: float
+		"""
+		key = tsk.uid()
+		if key == Utils.SIG_NIL:
+			return
+		lst = self.task_durations.get(key, []) + [duration]
+		self.task_durations[key] = lst[-DURATIONS:]
+
+	def get_task_durations(self, tsk):
+		"""
+		Returns the durations recorded for a task in the previous executions, the most recent last::
+
+			def build(bld):
+				def show(bld):
+					for tsk in bld.get_tgen_by_name('app').tasks:
+						print(tsk, bld.get_task_durations(tsk))
+				bld.add_post_fun(show)
+
+		:param tsk: task instance
+		:type tsk: :py:class:`waflib.Task.TaskBase`
+		:return: durations in seconds
+		:rtype: list of float
+		"""
+		return list(self.task_durations.get(tsk.uid(), []))
+
+	def get_task_duration(self, tsk):
+		"""
+		Returns the average duration of a task over the previous executions, see :py:meth:`waflib.Build.BuildContext.get_task_durations`
+
+		:param tsk: task instance
+		:type tsk: :py:class:`waflib.Task.TaskBase`
+		:return: duration in seconds or None if the task has never been executed
+		:rtype: float or None
+		"""
+		lst = self.task_durations.get(tsk.uid())
+		if not lst:
+			return None
+		return sum(lst) / len(lst)
+
 	def get_tgen_by_name(self, name):
 		"""
 		Fetches a task generator by its name or its target attribute;
@@ -612,6 +1511,8 @@ class BuildContext(Context.Context):
 		"""Adds a task or a task generator to the build; there is no attempt to remove it if it was already added."""
 		assert(isinstance(tgen, TaskGen.task_gen) or isinstance(tgen, Task.TaskBase))
 		tgen.bld = self
+		if isinstance(tgen, Task.TaskBase):
+			self.load_partition(getattr(getattr(tgen, 'generator', None), 'path', None))
 		self.get_group(group).append(tgen)
 
 	def get_group_name(self, g):
@@ -794,6 +1695,163 @@ class BuildContext(Context.Context):
 				tasks.append(tg)
 		return tasks
 
+	def hash_nodes(self, tasks):
+		"""
+		Computes the signatures of the input files, of the manual dependencies and of the
+		implicit dependencies from the previous build of the given tasks by using several threads,
+		so that the signatures are already in the node cache when the tasks are checked
+		by :py:meth:`waflib.Task.Task.runnable_status`. The outputs of the tasks in
+		:py:attr:`waflib.Build.BuildContext.cur_tasks` are skipped since they may change.
+		Called by :py:meth:`waflib.Build.BuildContext.get_build_iterator`.
+
+		:param tasks: tasks to be executed
+		:type tasks: list of :py:class:`waflib.Task.TaskBase`
+		"""
+		if self.jobs < 2:
+			return
+		try:
+			cache = self.cache_sig
+		except AttributeError:
+			cache = self.cache_sig = {}
+
+		outputs = set()
+		for tsk in self.cur_tasks:
+			outputs.update(getattr(tsk, 'outputs', []))
+
+		nodes = set()
+		for tsk in tasks:
+			try:
+				lst = tsk.inputs + tsk.dep_nodes + tsk.get_implicit_nodes()
+			except AttributeError:
+				continue
+			nodes.update(lst)
+		nodes = [x for x in nodes if not x in cache and not x in outputs]
+
+		num = min(self.jobs, len(nodes) // MIN_HASH_NODES)
+		if num < 2:
+			return
+
+		def run(lst):
+			for x in lst:
+				try:
+					x.get_bld_sig()
+				except EnvironmentError:
+					# raised again later in the task context
+					pass
+		threads = [Utils.threading.Thread(target=run, args=(nodes[i::num],)) for i in range(num)]
+		for x in threads:
+			x.start()
+		for x in threads:
+			x.join()
+
+	def scan_tasks(self, tasks):
+		"""
+		Scans the dependencies of the given tasks in forked worker processes before the tasks
+		are checked by :py:meth:`waflib.Task.Task.runnable_status`. The signatures of the tasks
+		are computed first, and the tasks that must be scanned again are collected in
+		:py:attr:`waflib.Build.BuildContext.scan_pending` instead of calling their scanners.
+		Each worker process receives a share of these tasks and returns the paths of the nodes
+		found, which are converted to nodes in :py:attr:`waflib.Build.BuildContext.scan_results`,
+		and the new entries of :py:attr:`waflib.Build.BuildContext.scan_cache`.
+
+		Only the scanners having the attribute ``parallel`` are executed in this manner (see :py:attr:`waflib.Task.Task.scan`),
+		and the tasks depending on the outputs of the tasks being executed are skipped. The other tasks are scanned
+		from :py:meth:`waflib.Task.Task.runnable_status` as usual.
+
+		Forking a process running several threads may leave locks held forever in the children, so the worker
+		processes are only created while the main thread is the only one running: this is the case until the first
+		task is executed, since the consumer threads of :py:class:`waflib.Runner.Parallel` are created at this point.
+		The processes are created for each build group, as they must see the tasks of the group.
+		This is disabled on platforms without ``os.fork`` and on macOS. Enable with ``waf --scan-pool``.
+		Called by :py:meth:`waflib.Build.BuildContext.get_build_iterator`.
+
+		:param tasks: tasks to be executed
+		:type tasks: list of :py:class:`waflib.Task.TaskBase`
+		"""
+		if self.jobs < 2 or not self.scan_pool or not hasattr(os, 'fork') or Utils.unversioned_sys_platform() == 'darwin':
+			return
+		if Utils.threading.active_count() > 1:
+			return
+		if len(self.cur_tasks) > len(tasks):
+			# tasks from the previous groups may be running (--pipeline)
+			return
+
+		outputs = set()
+		for tsk in tasks:
+			outputs.update(getattr(tsk, 'outputs', []))
+
+		lst = self.scan_pending = []
+		try:
+			for tsk in tasks:
+				if not getattr(getattr(tsk, 'scan', None), 'parallel', False):
+					continue
+				if [x for x in tsk.run_after if not x.hasrun]:
+					continue
+				if [x for x in tsk.inputs + tsk.dep_nodes if x in outputs]:
+					continue
+				try:
+					tsk.signature()
+				except Exception:
+					# raised again later in the task context
+					pass
+		finally:
+			self.scan_pending = None
+
+		num = min(self.jobs, len(lst) // MIN_SCAN_TASKS)
+		if num < 2:
+			return
+
+		self.load_partition('scan_cache')
+		def run(lst):
+			cache = dict(self.scan_cache)
+			ret = []
+			for tsk in lst:
+				try:
+					(nodes, names) = tsk.scan()
+				except Exception:
+					# scanned again in the main process
+					ret.append(None)
+				else:
+					ret.append(([x.abspath() for x in nodes], names))
+			new = [(k.abspath(), v) for (k, v) in self.scan_cache.items() if cache.get(k) is not v]
+			return (ret, new)
+
+		procs = []
+		for i in range(num):
+			(r, w) = os.pipe()
+			pid = os.fork()
+			if not pid:
+				# child process
+				try:
+					os.close(r)
+					data = cPickle.dumps(run(lst[i::num]), -1)
+					f = os.fdopen(w, 'wb')
+					f.write(data)
+					f.close()
+				finally:
+					os._exit(0)
+			os.close(w)
+			procs.append((pid, r))
+
+		for (i, (pid, r)) in enumerate(procs):
+			f = os.fdopen(r, 'rb')
+			try:
+				data = f.read()
+			finally:
+				f.close()
+				os.waitpid(pid, 0)
+			try:
+				(ret, new) = cPickle.loads(data)
+			except Exception:
+				continue
+
+			make_node = self.root.make_node
+			for (tsk, x) in zip(lst[i::num], ret):
+				if x:
+					self.scan_results[tsk.uid()] = ([make_node(y) for y in x[0]], x[1])
+			for (k, v) in new:
+				self.scan_cache[make_node(k)] = v
+
 	def get_build_iterator(self):
 		"""
 		Creates a Python generator object that returns lists of tasks that may be processed in parallel.
@@ -802,6 +1860,7 @@ class BuildContext(Context.Context):
 		:rtype: generator returning lists of :py:class:`waflib.Task.TaskBase`
 		"""
 		self.cur = 0
+		prev = []
 
 		if self.targets and self.targets != '*':
 			(self._min_grp, self._exact_tg) = self.get_targets()
@@ -810,6 +1869,7 @@ class BuildContext(Context.Context):
 		if self.post_mode != POST_LAZY:
 			while self.cur < len(self.groups):
 				self.post_group()
+				self.dump_graph()
 				self.cur += 1
 			self.cur = 0
 
@@ -817,6 +1877,7 @@ class BuildContext(Context.Context):
 			# first post the task generators for the group
 			if self.post_mode != POST_AT_ONCE:
 				self.post_group()
+				self.dump_graph()
 
 			# then extract the tasks
 			tasks = self.get_tasks_group(self.cur)
@@ -829,10 +1890,18 @@ class BuildContext(Context.Context):
 			Task.set_file_constraints(tasks)
 			Task.set_precedence_constraints(tasks)
 
-			self.cur_tasks = tasks
+			if self.pipeline:
+				# the tasks from the previous groups may still be running
+				prev = [x for x in prev if not x.hasrun]
+				Task.set_group_constraints(prev, tasks)
+				self.cur_tasks = prev = prev + tasks
+			else:
+				self.cur_tasks = tasks
 			self.cur += 1
 			if not tasks: # return something else the build will stop
 				continue
+			self.hash_nodes(tasks)
+			self.scan_tasks(tasks)
 			yield tasks
 
 		while 1:
@@ -134,6 +134,18 @@ class ConfigSet(object):
 		else:
 			del self[name]
 
+	def __reduce__(self):
+		"""
+		Pickles the table and the parent explicitly, as :py:meth:`waflib.ConfigSet.ConfigSet.__getattr__`
+		returns values for the special methods looked up by the pickle module
+		"""
+		return (ConfigSet, (), (self.table, getattr(self, 'parent', None)))
+
+	def __setstate__(self, state):
+		self.table = state[0]
+		if state[1] is not None:
+			self.parent = state[1]
+
 	def derive(self):
 		"""
 		Returns a new ConfigSet deriving from self. The copy returned
@@ -133,6 +133,9 @@ class ConfigurationContext(Context.Context):
 		"""
 		self.init_dirs()
 
+		# the hash of the scripts (env.hash) uses the same algorithm as the builds
+		Utils.set_hash(Options.options.hash_algorithm)
+
 		self.cachedir = self.bldnode.make_node(Build.CACHE_DIR)
 		self.cachedir.mkdir()
 
@@ -178,6 +181,7 @@ class ConfigurationContext(Context.Context):
 		# conf.hash & conf.files hold wscript files paths and hash
 		# (used only by Configure.autoconfig)
 		env.hash = self.hash
+		env.hash_algorithm = Utils.hash_algorithm
 		env.files = self.files
 		env.environ = dict(self.environ)
 
@@ -214,7 +218,7 @@ class ConfigurationContext(Context.Context):
 	def store(self):
 		"""Save the config results into the cache file"""
 		n = self.cachedir.make_node('build.config.py')
-		n.write('version = 0x%x\ntools = %r\n' % (Context.HEXVERSION, self.tools))
+		n.write('version = 0x%x\ntools = %r\nhash_algorithm = %r\n' % (Context.HEXVERSION, self.tools, Utils.hash_algorithm))
 
 		if not self.all_envs:
 			self.fatal('nothing to store in the configuration context!')
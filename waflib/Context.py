@@ -154,7 +154,7 @@ class Context(ctx):
 			rd = run_dir
 
 		# binds the context to the nodes in use to avoid a context singleton
-		self.node_class = type('Nod3', (waflib.Node.Node,), {})
+		self.node_class = type('Nod3', (waflib.Node.Node,), {'__slots__': ()})
 		self.node_class.__module__ = 'waflib.Node'
 		self.node_class.ctx = self
 
@@ -21,7 +21,7 @@ Node: filesystem structure
    owning a node is held as *self.ctx*
 """
 
-import os, re, sys, shutil
+import os, re, sys, shutil, stat, time
 from waflib import Utils, Errors
 
 exclude_regs = '''
@@ -60,6 +60,29 @@ Ant patterns for files and folders to exclude while doing the
 recursive traversal in :py:meth:`waflib.Node.Node.ant_glob`
 """
 
+try:
+	_intern = sys.intern
+except AttributeError:
+	import __builtin__
+	_intern = __builtin__.intern
+
+def intern(name):
+	"""
+	Returns a unique copy of the node name, so that the nodes of the same name
+	(``wscript``, ``main.c``, ...) share the same string object
+	"""
+	try:
+		return _intern(name)
+	except TypeError:
+		# unicode on Python 2
+		return name
+
+RACY_DELAY = 2
+"""
+Files modified less than this amount of seconds before being hashed are not added to
+:py:attr:`waflib.Build.BuildContext.file_hashes`, see :py:meth:`waflib.Node.Node.h_file_cached`
+"""
+
 class Node(object):
 	"""
 	This class is organized in two parts:
@@ -74,11 +97,16 @@ class Node(object):
 	"""
 
 	__slots__ = ('name', 'parent', 'children', 'cache_abspath', 'cache_isdir')
+	"""
+	Nodes have no ``__dict__``; the ``children`` dict is only created for folders.
+	The subclasses must declare empty ``__slots__`` too (see :py:class:`waflib.Node.Nod3`)
+	"""
+
 	def __init__(self, name, parent):
 		"""
 		.. note:: Use :py:func:`Node.make_node` or :py:func:`Node.find_node` instead of calling this constructor
 		"""
-		self.name = name
+		self.name = intern(name)
 		self.parent = parent
 		if parent:
 			if name in parent.children:
@@ -87,7 +115,7 @@ class Node(object):
 
 	def __setstate__(self, data):
 		"Deserializes node information, used for persistence"
-		self.name = data[0]
+		self.name = intern(data[0])
 		self.parent = data[1]
 		if data[2] is not None:
 			# Issue 1480
@@ -97,6 +125,21 @@ class Node(object):
 		"Serializes node information, used for persistence"
 		return (self.name, self.parent, getattr(self, 'children', None))
 
+	def __reduce_ex__(self, proto):
+		"""
+		Serializes the nodes as references to the flat path table of a :py:class:`waflib.Node.flat_tree`
+		pickled before, instead of pickling the whole node tree recursively
+		"""
+		if pickle_index is None:
+			return object.__reduce_ex__(self, proto)
+		try:
+			return (load_index, (pickle_index[self],))
+		except KeyError:
+			if self.parent is None:
+				return object.__reduce_ex__(self, proto)
+			# node removed from the tree
+			return (load_child, (self.parent, self.name))
+
 	def __str__(self):
 		"""
 		String representation (abspath), for debugging purposes
@@ -890,9 +933,46 @@ class Node(object):
 		"""
 		return Utils.h_file(self.abspath())
 
+	def h_file_cached(self):
+		"""
+		Returns the hash of the file contents computed by :py:meth:`waflib.Node.Node.h_file`,
+		or the hash computed during a previous build if the file status (modification time,
+		size, inode and change time) is unchanged. The hashes are kept in
+		:py:attr:`waflib.Build.BuildContext.file_hashes`; the files modified less than
+		:py:const:`waflib.Node.RACY_DELAY` seconds ago are always hashed again since a
+		later modification may leave the same status. The cache is used only when
+		:py:attr:`waflib.Build.BuildContext.hash_cache` is set (disable with ``waf --no-hash-cache``).
+
+		:return: a hash representing the file contents
+		:rtype: string or bytes
+		"""
+		ctx = self.ctx
+		if not getattr(ctx, 'hash_cache', False):
+			return self.h_file()
+
+		st = os.stat(self.abspath())
+		if stat.S_ISDIR(st.st_mode):
+			# let h_file raise the error
+			return self.h_file()
+		key = (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size, st.st_ino, getattr(st, 'st_ctime_ns', st.st_ctime))
+		try:
+			k, ret = ctx.file_hashes[self]
+		except KeyError:
+			pass
+		else:
+			if k == key:
+				return ret
+
+		ret = self.h_file()
+		if time.time() - max(st.st_mtime, st.st_ctime) > RACY_DELAY:
+			ctx.file_hashes[self] = (key, ret)
+		else:
+			ctx.file_hashes.pop(self, None)
+		return ret
+
 	def get_bld_sig(self):
 		"""
-		Returns a signature (see :py:meth:`waflib.Node.Node.h_file`) for the purpose
+		Returns a signature (see :py:meth:`waflib.Node.Node.h_file_cached`) for the purpose
 		of build dependency calculation. This method uses a per-context cache.
 
 		:return: a hash representing the object contents
@@ -908,7 +988,7 @@ class Node(object):
 		except KeyError:
 			p = self.abspath()
 			try:
-				ret = cache[self] = self.h_file()
+				ret = cache[self] = self.h_file_cached()
 			except EnvironmentError:
 				if self.isdir():
 					# allow folders as build nodes, do not use the creation time
@@ -934,8 +1014,75 @@ class Node(object):
 pickle_lock = Utils.threading.Lock()
 """Lock mandatory for thread-safe node serialization"""
 
+pickle_index = None
+"""Indices of the nodes in the flat path table being pickled, see :py:class:`waflib.Node.flat_tree`"""
+
+pickle_nodes = None
+"""Nodes of the flat path table being unpickled, see :py:func:`waflib.Node.unflatten`"""
+
+class flat_tree(object):
+	"""
+	Pickles a node tree as a flat path table: a list of names and a list of parent indices.
+	The nodes pickled afterwards under :py:data:`waflib.Node.pickle_lock` are then replaced by their indices::
+
+		root, data = cPickle.loads(cPickle.dumps((Node.flat_tree(root), data)))
+
+	The table is computed when the object is created, and this sets :py:data:`waflib.Node.pickle_index`.
+	Pickling and unpickling must be followed by the reset of :py:data:`waflib.Node.pickle_index`
+	and :py:data:`waflib.Node.pickle_nodes`
+	"""
+	__slots__ = ('names', 'parents')
+	def __init__(self, root):
+		global pickle_index
+		names = self.names = [root.name]
+		parents = self.parents = [-1]
+		index = {root: 0}
+		stack = [root]
+		while stack:
+			node = stack.pop()
+			try:
+				children = node.children
+			except AttributeError:
+				continue
+			idx = index[node]
+			for x in children.values():
+				index[x] = len(names)
+				names.append(x.name)
+				parents.append(idx)
+				stack.append(x)
+		pickle_index = index
+	def __reduce__(self):
+		return (unflatten, (self.names, self.parents))
+
+def unflatten(names, parents):
+	"""
+	Rebuilds a node tree from a flat path table, see :py:class:`waflib.Node.flat_tree`
+
+	:return: the root node
+	"""
+	global pickle_nodes
+	cls = Nod3
+	nodes = [cls(names[0], None)]
+	for i in range(1, len(names)):
+		parent = nodes[parents[i]]
+		try:
+			parent.children
+		except AttributeError:
+			parent.children = parent.dict_class()
+		nodes.append(cls(names[i], parent))
+	pickle_nodes = nodes
+	return nodes[0]
+
+def load_index(idx):
+	"Returns a node of the flat path table being unpickled"
+	return pickle_nodes[idx]
+
+def load_child(parent, name):
+	"Returns a node that was not in the flat path table"
+	return parent.make_node([name])
+
 class Nod3(Node):
 	"""Mandatory subclass for thread-safe node serialization"""
-	pass # do not remove
+	__slots__ = () # do not remove
 
 
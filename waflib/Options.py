@@ -121,6 +121,9 @@ class OptionsContext(Context.Context):
 		gr.add_option('-o', '--out', action='store', default='', help='build dir for the project', dest='out')
 		gr.add_option('-t', '--top', action='store', default='', help='src dir for the project', dest='top')
 
+		gr.add_option('--hash-algorithm', action='store', default='md5', dest='hash_algorithm',
+			help='hash function for the file and task signatures, one of %r [default: md5]' % sorted(Utils.hash_algorithms.keys()))
+
 		gr.add_option('--no-lock-in-run', action='store_true', default='', help=optparse.SUPPRESS_HELP, dest='no_lock_in_run')
 		gr.add_option('--no-lock-in-out', action='store_true', default='', help=optparse.SUPPRESS_HELP, dest='no_lock_in_out')
 		gr.add_option('--no-lock-in-top', action='store_true', default='', help=optparse.SUPPRESS_HELP, dest='no_lock_in_top')
@@ -141,6 +144,13 @@ class OptionsContext(Context.Context):
 		self.option_groups['build and install options'] = gr
 		gr.add_option('-p', '--progress', dest='progress_bar', default=0, action='count', help= '-p: progress bar; -pp: ide output')
 		gr.add_option('--targets',        dest='targets', default='', action='store', help='task generators, e.g. "target1,target2"')
+		gr.add_option('--prio',           dest='prio', default=False, action='store_true', help='execute the tasks on the critical path first')
+		gr.add_option('--pipeline',       dest='pipeline', default=False, action='store_true', help='execute the next build groups without waiting for the current one to complete')
+		gr.add_option('--mem-budget',     dest='mem_budget', default=0, type='int', help='memory available for the tasks in MB [default: no limit]')
+		gr.add_option('--no-hash-cache',  dest='hash_cache', default=True, action='store_false', help='hash all the files again instead of reusing the hashes of unchanged files')
+		gr.add_option('--scan-pool',      dest='scan_pool', default=False, action='store_true', help='scan the dependencies in forked worker processes before the tasks are executed')
+		gr.add_option('--null-check',     dest='null_check', default=False, action='store_true', help='exit immediately if no file changed since the last build that executed no task')
+		gr.add_option('--reuse-graph',    dest='reuse_graph', default=False, action='store_true', help='reuse the task generators posted by the previous build if the scripts and the options are unchanged')
 
 		gr = self.add_option_group('Step options')
 		self.option_groups['step options'] = gr
@@ -6,7 +6,7 @@
 Runner.py: Task scheduling and execution
 """
 
-import random
+import random, heapq
 try:
 	from queue import Queue
 except ImportError:
@@ -18,69 +18,104 @@ GAP = 20
 Wait for at least ``GAP * njobs`` before trying to enqueue more tasks to run
 """
 
+class PriorityTasks(object):
+	"""
+	Heap of tasks providing the subset of the ``deque`` interface used by :py:class:`waflib.Runner.Parallel`.
+	The tasks having the highest :py:attr:`waflib.Task.TaskBase.prio_order` are returned first,
+	and tasks of equal priority are returned in insertion order. The value *None* is always returned last.
+	"""
+	def __init__(self):
+		self.lst = []
+		self.seq = 0
+	def __len__(self):
+		return len(self.lst)
+	def __iter__(self):
+		return (x[2] for x in self.lst)
+	def clear(self):
+		self.lst = []
+	def key(self, tsk):
+		if tsk is None:
+			return float('inf')
+		return -tsk.prio_order
+	def append(self, tsk):
+		self.seq += 1
+		heapq.heappush(self.lst, (self.key(tsk), self.seq, tsk))
+	def appendleft(self, tsk):
+		self.seq += 1
+		heapq.heappush(self.lst, (self.key(tsk), -self.seq, tsk))
+	def extend(self, lst):
+		for x in lst:
+			self.append(x)
+	def popleft(self):
+		return heapq.heappop(self.lst)[2]
+
+class PriorityQueue(Queue):
+	"""
+	Thread-safe queue returning the tasks in the order given by :py:class:`waflib.Runner.PriorityTasks`
+	"""
+	def _init(self, maxsize):
+		self.queue = PriorityTasks()
+	def _qsize(self, len=len):
+		return len(self.queue)
+	def _put(self, tsk):
+		self.queue.append(tsk)
+	def _get(self):
+		return self.queue.popleft()
+
 class Consumer(Utils.threading.Thread):
 	"""
-	Daemon thread object that executes a task. It shares a semaphore with
-	the coordinator :py:class:`waflib.Runner.Spawner`. There is one
-	instance per task to consume.
+	Daemon thread object that executes tasks. The consumers are created once by
+	:py:class:`waflib.Runner.Spawner` and process the tasks from :py:attr:`waflib.Runner.Parallel.ready`
+	until they obtain *None*.
 	"""
-	__slots__ = ('task', 'spawner')
-	def __init__(self, spawner, task):
+	def __init__(self, spawner):
 		Utils.threading.Thread.__init__(self)
-		self.task = task
-		"""Task to execute"""
 		self.spawner = spawner
 		"""Coordinator object"""
 		self.setDaemon(1)
 		self.start()
 	def run(self):
 		"""
-		Processes a single task
+		Processes tasks until the producer has no more task to provide
 		"""
-		try:
-			if not self.spawner.master.stop:
-				self.task.process()
-		finally:
-			self.spawner.sem.release()
-			self.spawner.master.out.put(self.task)
-			self.task = None
-			self.spawner = None
-
-class Spawner(Utils.threading.Thread):
+		master = self.spawner.master
+		while 1:
+			tsk = master.ready.get()
+			if tsk is None:
+				# let the other consumers end too
+				master.ready.put(None)
+				break
+			try:
+				if not master.stop:
+					master.log_display(tsk)
+					tsk.process()
+			except Exception:
+				# keep the consumer alive if the task cannot be processed
+				tsk.err_msg = Utils.ex_stack()
+				tsk.hasrun = Task.EXCEPTION
+				master.error_handler(tsk)
+			finally:
+				master.out.put(tsk)
+
+class Spawner(object):
 	"""
-	Daemon thread that consumes tasks from :py:class:`waflib.Runner.Parallel` producer and
-	spawns a consuming thread :py:class:`waflib.Runner.Consumer` for each
-	:py:class:`waflib.Task.TaskBase` instance.
+	Creates a fixed pool of :py:class:`waflib.Runner.Consumer` threads, one per job,
+	to execute the :py:class:`waflib.Task.TaskBase` instances provided by the
+	:py:class:`waflib.Runner.Parallel` producer. The threads end when the
+	producer adds *None* to :py:attr:`waflib.Runner.Parallel.ready`.
 	"""
 	def __init__(self, master):
-		Utils.threading.Thread.__init__(self)
 		self.master = master
 		""":py:class:`waflib.Runner.Parallel` producer instance"""
-		self.sem = Utils.threading.Semaphore(master.numjobs)
-		"""Bounded semaphore that prevents spawning more than *n* concurrent consumers"""
-		self.setDaemon(1)
-		self.start()
-	def run(self):
-		"""
-		Spawns new consumers to execute tasks by delegating to :py:meth:`waflib.Runner.Spawner.loop`
-		"""
-		try:
-			self.loop()
-		except Exception:
-			# Python 2 prints unnecessary messages when shutting down
-			# we also want to stop the thread properly
-			pass
-	def loop(self):
+		self.pool = [Consumer(self) for i in range(master.numjobs)]
+		"""Consumer threads"""
+
+	def join(self):
 		"""
-		Consumes task objects from the producer; ends when the producer has no more
-		task to provide.
+		Waits for the consumer threads to end, so that they do not outlive the interpreter
 		"""
-		master = self.master
-		while 1:
-			task = master.ready.get()
-			self.sem.acquire()
-			task.log_display(task.generator.bld)
-			Consumer(self, task)
+		for x in self.pool:
+			x.join()
 
 class Parallel(object):
 	"""
@@ -102,18 +137,74 @@ class Parallel(object):
 		Instance of :py:class:`waflib.Build.BuildContext`
 		"""
 
-		self.outstanding = Utils.deque()
+		self.prio = getattr(bld, 'prio', False)
+		"""
+		Whether to execute the tasks on the critical path first, see :py:meth:`waflib.Runner.Parallel.set_priorities`
+		"""
+
+		self.pipeline = getattr(bld, 'pipeline', False)
+		"""
+		Whether to process the next build groups before the current one is complete,
+		see :py:attr:`waflib.Build.BuildContext.pipeline`
+		"""
+
+		if self.prio:
+			self.outstanding = PriorityTasks()
+		else:
+			self.outstanding = Utils.deque()
 		"""List of :py:class:`waflib.Task.TaskBase` that may be ready to be executed"""
 
 		self.frozen = Utils.deque()
-		"""List of :py:class:`waflib.Task.TaskBase` that are not ready yet"""
+		"""
+		List of :py:class:`waflib.Task.TaskBase` that are not ready yet for reasons other than
+		the tasks in their ``run_after`` sets, see :py:meth:`waflib.Runner.Parallel.postpone`
+		"""
+
+		self.incomplete = {}
+		"""
+		Maps the :py:class:`waflib.Task.TaskBase` objects waiting for other tasks to complete
+		to the amount of tasks they are still waiting for
+		"""
+
+		self.revdeps = Utils.defaultdict(set)
+		"""
+		Maps the :py:class:`waflib.Task.TaskBase` objects to the sets of tasks waiting for them to complete,
+		see :py:meth:`waflib.Runner.Parallel.mark_finished`
+		"""
+
+		self.pending = Utils.deque()
+		"""
+		List of :py:class:`waflib.Task.TaskBase` ready to be executed, but waiting for
+		enough resources to be available, see :py:meth:`waflib.Runner.Parallel.add_task`
+		"""
+
+		self.reserved = {}
+		"""
+		Maps the :py:class:`waflib.Task.TaskBase` objects being executed to the resources
+		they use, see :py:meth:`waflib.Runner.Parallel.get_resources`
+		"""
+
+		self.used_cores = 0
+		"""Amount of jobs used by the tasks being executed"""
+
+		self.used_mem = 0
+		"""Memory used by the tasks being executed, in MB"""
+
+		self.mem_budget = getattr(bld, 'mem_budget', 0)
+		"""Memory available for the tasks in MB, or 0 for no limit"""
 
-		self.ready = Queue(0)
+		if self.prio:
+			self.ready = PriorityQueue(0)
+		else:
+			self.ready = Queue(0)
 		"""List of :py:class:`waflib.Task.TaskBase` ready to be executed by consumers"""
 
 		self.out = Queue(0)
 		"""List of :py:class:`waflib.Task.TaskBase` returned by the task consumers"""
 
+		self.display_lock = Utils.threading.Lock()
+		"""Lock serializing the status lines of the tasks, see :py:meth:`waflib.Runner.Parallel.log_display`"""
+
 		self.count = 0
 		"""Amount of tasks that may be processed by :py:class:`waflib.Runner.TaskConsumer`"""
 
@@ -134,9 +225,10 @@ class Parallel(object):
 		Flag that indicates that the build cache must be saved when a task was executed
 		(calls :py:meth:`waflib.Build.BuildContext.store`)"""
 
-		self.spawner = Spawner(self)
+		self.spawner = None
 		"""
-		Coordinating daemon thread that spawns thread consumers
+		Pool of consumer threads executing the tasks from :py:attr:`waflib.Runner.Parallel.ready`,
+		created when the first task is executed (see :py:meth:`waflib.Build.BuildContext.scan_tasks`)
 		"""
 
 	def get_next_task(self):
@@ -151,17 +243,87 @@ class Parallel(object):
 
 	def postpone(self, tsk):
 		"""
-		Adds the task to the list :py:attr:`waflib.Runner.Parallel.frozen`.
-		The order is scrambled so as to consume as many tasks in parallel as possible.
+		Called when a task is not ready to be executed. If the task waits for tasks from
+		its ``run_after`` set, it is only processed again once they are complete
+		(see :py:meth:`waflib.Runner.Parallel.wait_for`). Otherwise the task is added to
+		the list :py:attr:`waflib.Runner.Parallel.frozen`, in which the order is scrambled so as
+		to consume as many tasks in parallel as possible.
 
 		:param tsk: task instance
 		:type tsk: :py:class:`waflib.Task.TaskBase`
 		"""
+		if self.wait_for(tsk):
+			return
 		if random.randint(0, 1):
 			self.frozen.appendleft(tsk)
 		else:
 			self.frozen.append(tsk)
 
+	def wait_for(self, tsk):
+		"""
+		Registers a task in :py:attr:`waflib.Runner.Parallel.incomplete` if some of the tasks
+		from its ``run_after`` set are not complete yet. The task is added back to
+		:py:attr:`waflib.Runner.Parallel.outstanding` when the last of them completes, so that
+		the method ``runnable_status`` is not called repeatedly on tasks that cannot run.
+
+		:param tsk: task instance
+		:type tsk: :py:class:`waflib.Task.TaskBase`
+		:return: the amount of tasks to wait for
+		:rtype: int
+		"""
+		n = self.incomplete.get(tsk, 0)
+		for k in getattr(tsk, 'run_after', ()):
+			if not k.hasrun:
+				waiting = self.revdeps[k]
+				if not tsk in waiting:
+					waiting.add(tsk)
+					n += 1
+		if n:
+			self.incomplete[tsk] = n
+		return n
+
+	def mark_finished(self, tsk):
+		"""
+		Called when a task is complete (executed, skipped or failed). Its resources are released
+		(see :py:meth:`waflib.Runner.Parallel.release`) and the tasks waiting for it are added to :py:attr:`waflib.Runner.Parallel.outstanding` when it was the last
+		task they were waiting for. The ``run_after`` sets may change while the build is running,
+		so the tasks are still asked for their status (``runnable_status``) before running.
+
+		:param tsk: task instance
+		:type tsk: :py:class:`waflib.Task.TaskBase`
+		"""
+		self.release(tsk)
+		try:
+			waiting = self.revdeps.pop(tsk)
+		except KeyError:
+			return
+		for x in waiting:
+			n = self.incomplete[x] - 1
+			if n:
+				self.incomplete[x] = n
+			else:
+				del self.incomplete[x]
+				self.outstanding.append(x)
+
+	def deadlock_error(self):
+		"""
+		Creates the exception raised when no task can be executed anymore, for example when
+		tasks depend on each other or when a method ``runnable_status`` never returns a final status.
+
+		:rtype: :py:class:`waflib.Errors.WafError`
+		"""
+		msg = 'check the build order for the tasks'
+		for tsk in self.frozen:
+			if not tsk.run_after:
+				msg = 'check the methods runnable_status'
+				break
+		lst = []
+		for tsk in self.frozen:
+			lst.append('%s\t-> %r' % (repr(tsk), [id(x) for x in tsk.run_after]))
+		for tsk in self.incomplete:
+			lst.append('%s\t-> %r' % (repr(tsk), [id(x) for x in tsk.run_after if not x.hasrun]))
+		return Errors.WafError('Deadlock detected: %s%s' % (msg, ''.join(lst)))
+
 	def refill_task_list(self):
 		"""
 		Adds the next group of tasks to execute in :py:attr:`waflib.Runner.Parallel.outstanding`.
@@ -169,8 +331,12 @@ class Parallel(object):
 		while self.count > self.numjobs * GAP:
 			self.get_out()
 
+		# collect the tasks that are already complete so that the tasks waiting for them become ready
+		while self.count and not self.out.empty():
+			self.get_out()
+
 		while not self.outstanding:
-			if self.count:
+			if self.count and (self.frozen or not self.pipeline):
 				self.get_out()
 			elif self.frozen:
 				try:
@@ -179,24 +345,28 @@ class Parallel(object):
 					pass
 				else:
 					if cond:
-						msg = 'check the build order for the tasks'
-						for tsk in self.frozen:
-							if not tsk.run_after:
-								msg = 'check the methods runnable_status'
-								break
-						lst = []
-						for tsk in self.frozen:
-							lst.append('%s\t-> %r' % (repr(tsk), [id(x) for x in tsk.run_after]))
-						raise Errors.WafError('Deadlock detected: %s%s' % (msg, ''.join(lst)))
+						raise self.deadlock_error()
 				self.deadlock = self.processed
 
 			if self.frozen:
 				self.outstanding.extend(self.frozen)
 				self.frozen.clear()
-			elif not self.count:
-				self.outstanding.extend(next(self.biter))
-				self.total = self.bld.total()
-				break
+			elif not self.outstanding and (self.pipeline or not self.count):
+				if self.incomplete and not self.count:
+					raise self.deadlock_error()
+				tasks = next(self.biter)
+				if self.prio:
+					self.set_priorities(tasks)
+				for x in tasks:
+					if not self.wait_for(x):
+						self.outstanding.append(x)
+				if tasks:
+					self.total = self.bld.total()
+				elif self.pipeline and self.count:
+					# no more build groups, wait for the tasks running
+					self.get_out()
+				else:
+					break
 
 	def add_more_tasks(self, tsk):
 		"""
@@ -207,31 +377,177 @@ class Parallel(object):
 		:type tsk: :py:attr:`waflib.Task.TaskBase`
 		"""
 		if getattr(tsk, 'more_tasks', None):
-			self.outstanding.extend(tsk.more_tasks)
+			if self.prio:
+				self.set_priorities(tsk.more_tasks)
+				for x in tsk.more_tasks:
+					# the tasks waiting on the current task are likely to wait on the new ones too
+					x.prio_order = max(x.prio_order, tsk.prio_order)
+			for x in tsk.more_tasks:
+				if not self.wait_for(x):
+					self.outstanding.append(x)
 			self.total += len(tsk.more_tasks)
 
+	def get_cost(self, tsk):
+		"""
+		Estimates the cost of executing a task, used by :py:meth:`waflib.Runner.Parallel.set_priorities`.
+		The average duration recorded in previous builds is used when available
+		(see :py:meth:`waflib.Build.BuildContext.get_task_duration`), else :py:attr:`waflib.Task.TaskBase.weight`.
+
+		:param tsk: task instance
+		:type tsk: :py:attr:`waflib.Task.TaskBase`
+		:rtype: number
+		"""
+		ret = self.bld.get_task_duration(tsk)
+		if ret is None:
+			return tsk.weight
+		return ret
+
+	def set_priorities(self, tasks):
+		"""
+		Sets :py:attr:`waflib.Task.TaskBase.prio_order` on the tasks given to the cost of the longest
+		chain of tasks that must run after them (the task included), following the ``run_after``
+		constraints in reverse. The tasks on the critical path are then executed first,
+		see :py:attr:`waflib.Runner.Parallel.prio`.
+
+		:param tasks: tasks
+		:type tasks: list of :py:class:`waflib.Task.TaskBase`
+		"""
+		reverse = Utils.defaultdict(list)
+		for x in tasks:
+			for k in getattr(x, 'run_after', ()):
+				reverse[k].append(x)
+
+		# depth-first traversal without recursion as the chains of tasks may be long;
+		# the tasks on dependency cycles get a value of None until processed, the
+		# cycles are then reported by refill_task_list
+		weights = {}
+		for x in tasks:
+			if x in weights:
+				continue
+			stack = [(x, False)]
+			while stack:
+				(n, expanded) = stack.pop()
+				if expanded:
+					w = 0
+					for k in reverse.get(n, ()):
+						w = max(w, weights[k] or 0)
+					weights[n] = n.prio_order = self.get_cost(n) + w
+				elif not n in weights:
+					weights[n] = None
+					stack.append((n, True))
+					for k in reverse.get(n, ()):
+						if not k in weights:
+							stack.append((k, False))
+
 	def get_out(self):
 		"""
 		Waits for a Task that task consumers add to :py:attr:`waflib.Runner.Parallel.out` after execution.
-		Adds more Tasks if necessary through :py:attr:`waflib.Runner.Parallel.add_more_tasks`.
+		Adds more Tasks if necessary through :py:attr:`waflib.Runner.Parallel.add_more_tasks`
+		and releases the tasks waiting for it through :py:meth:`waflib.Runner.Parallel.mark_finished`.
 
 		:rtype: :py:attr:`waflib.Task.TaskBase`
 		"""
 		tsk = self.out.get()
 		if not self.stop:
 			self.add_more_tasks(tsk)
+		self.mark_finished(tsk)
 		self.count -= 1
 		self.dirty = True
 		return tsk
 
+	def log_display(self, tsk):
+		"""
+		Displays the execution status of a task. The consumer threads display the tasks
+		one at a time, as the progress bar and the loggers are not thread-safe.
+
+		:param tsk: task instance
+		:type tsk: :py:attr:`waflib.Task.TaskBase`
+		"""
+		self.display_lock.acquire()
+		try:
+			tsk.log_display(tsk.generator.bld)
+		finally:
+			self.display_lock.release()
+
 	def add_task(self, tsk):
 		"""
 		Enqueue a Task to :py:attr:`waflib.Runner.Parallel.ready` so that consumers can run them.
+		The task is kept in :py:attr:`waflib.Runner.Parallel.pending` until enough resources are
+		available, see :py:meth:`waflib.Runner.Parallel.reserve`.
 
 		:param tsk: task instance
 		:type tsk: :py:attr:`waflib.Task.TaskBase`
 		"""
-		self.ready.put(tsk)
+		if not self.spawner:
+			self.spawner = Spawner(self)
+		if self.pending or not self.reserve(tsk):
+			# first in, first out so that the tasks using many resources are not delayed forever
+			self.pending.append(tsk)
+		else:
+			self.ready.put(tsk)
+
+	def get_resources(self, tsk):
+		"""
+		Returns the amount of jobs and the memory in MB used by a task. The values are read from
+		the task generator attribute ``resources``, which maps task class names to dicts, else from the
+		task attributes :py:attr:`waflib.Task.TaskBase.cores` and :py:attr:`waflib.Task.TaskBase.mem`::
+
+			def build(bld):
+				bld.program(source='main.c', target='app', resources={'cprogram': {'mem': 4000}})
+
+			$ waf build -j32 --mem-budget=16000
+
+		:param tsk: task instance
+		:type tsk: :py:attr:`waflib.Task.TaskBase`
+		:return: a tuple (cores, mem)
+		:rtype: tuple
+		"""
+		try:
+			d = tsk.generator.resources[tsk.__class__.__name__]
+		except (AttributeError, KeyError):
+			return (tsk.cores, tsk.mem)
+		return (d.get('cores', tsk.cores), d.get('mem', tsk.mem))
+
+	def reserve(self, tsk):
+		"""
+		Reserves the resources used by a task if they are available. A task requiring more than
+		the amount of jobs or than the memory budget is executed when no other task is running.
+
+		:param tsk: task instance
+		:type tsk: :py:attr:`waflib.Task.TaskBase`
+		:return: True if the task may be executed
+		:rtype: bool
+		"""
+		cores, mem = self.get_resources(tsk)
+		if self.reserved:
+			if self.used_cores + cores > self.numjobs:
+				return False
+			if mem and self.mem_budget and self.used_mem + mem > self.mem_budget:
+				return False
+		self.reserved[tsk] = (cores, mem)
+		self.used_cores += cores
+		self.used_mem += mem
+		return True
+
+	def release(self, tsk):
+		"""
+		Releases the resources used by a task and executes the tasks
+		from :py:attr:`waflib.Runner.Parallel.pending` that may run now
+
+		:param tsk: task instance
+		:type tsk: :py:attr:`waflib.Task.TaskBase`
+		"""
+		try:
+			cores, mem = self.reserved.pop(tsk)
+		except KeyError:
+			return
+		self.used_cores -= cores
+		self.used_mem -= mem
+		while self.pending:
+			# after an error, the consumers return the remaining tasks without executing them
+			if not self.stop and not self.reserve(self.pending[0]):
+				break
+			self.ready.put(self.pending.popleft())
 
 	def skip(self, tsk):
 		"""
@@ -259,6 +575,24 @@ class Parallel(object):
 			self.stop = True
 		self.error.append(tsk)
 
+	def add_duration(self, tsk, duration):
+		"""
+		Called by the consumers when a task was executed successfully; records its duration through
+		:py:meth:`waflib.Build.BuildContext.add_task_duration`
+
+		:param tsk: task instance
+		:type tsk: :py:attr:`waflib.Task.TaskBase`
+		:param duration: execution time in seconds
+		:type duration: float
+		"""
+		try:
+			add = self.bld.add_task_duration
+		except AttributeError:
+			# not a build context, see waflib.Tools.c_config.multicheck
+			pass
+		else:
+			add(tsk, duration)
+
 	def task_status(self, tsk):
 		"""
 		Obtains the task status to decide whether to run it immediately or not.
@@ -290,8 +624,8 @@ class Parallel(object):
 	def start(self):
 		"""
 		Obtains Task instances from the BuildContext instance and adds the ones that need to be executed to
-		:py:class:`waflib.Runner.Parallel.ready` so that the :py:class:`waflib.Runner.Spawner` consumer thread
-		has them executed. Obtains the executed Tasks back from :py:class:`waflib.Runner.Parallel.out`
+		:py:class:`waflib.Runner.Parallel.ready` so that the :py:class:`waflib.Runner.Spawner` consumer threads
+		have them executed. Obtains the executed Tasks back from :py:class:`waflib.Runner.Parallel.out`
 		and marks the build as failed by setting the ``stop`` flag.
 		If only one job is used, then executes the tasks one by one, without consumers.
 		"""
@@ -314,6 +648,7 @@ class Parallel(object):
 			if tsk.hasrun:
 				# if the task is marked as "run", just skip it
 				self.processed += 1
+				self.mark_finished(tsk)
 				continue
 
 			if self.stop: # stop immediately after a failure was detected
@@ -326,7 +661,7 @@ class Parallel(object):
 				self.processed += 1
 
 				if self.numjobs == 1:
-					tsk.log_display(tsk.generator.bld)
+					self.log_display(tsk)
 					try:
 						tsk.process()
 					finally:
@@ -339,6 +674,9 @@ class Parallel(object):
 				self.processed += 1
 				self.skip(tsk)
 				self.add_more_tasks(tsk)
+				self.mark_finished(tsk)
+			elif st == Task.EXCEPTION:
+				self.mark_finished(tsk)
 
 		# self.count represents the tasks that have been made available to the consumer threads
 		# collect all the tasks after an error else the message may be incomplete
@@ -346,5 +684,7 @@ class Parallel(object):
 			self.get_out()
 
 		self.ready.put(None)
+		if self.spawner:
+			self.spawner.join()
 		assert (self.count == 0 or self.stop)
 
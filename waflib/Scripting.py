@@ -287,7 +287,7 @@ def distclean_dir(dirname):
 				except OSError:
 					Logs.warn('Could not remove %r', fname)
 
-	for x in (Context.DBFILE, 'config.log'):
+	for x in (Context.DBFILE, Context.DBFILE + Build.JOURNAL, 'config.log'):
 		try:
 			os.remove(x)
 		except OSError:
@@ -590,6 +590,7 @@ def autoconfigure(execute_method):
 			if env.run_dir != Context.run_dir:
 				do_config = True
 			else:
+				Utils.set_hash(env.hash_algorithm or 'md5')
 				h = 0
 				for f in env.files:
 					try:
@@ -6,7 +6,7 @@
 Tasks represent atomic operations such as processes.
 """
 
-import os, re, sys, tempfile
+import os, re, sys, tempfile, time
 from waflib import Utils, Logs, Errors
 
 # task states
@@ -146,6 +146,19 @@ class TaskBase(evil):
 	This may be useful for certain extensions but it can a lot of memory.
 	"""
 
+	weight = 1
+	"""Estimated cost of executing the task in seconds, used for scheduling the tasks on the critical path first
+	when no duration was recorded in a previous build (see :py:meth:`waflib.Runner.Parallel.get_cost`)"""
+
+	prio_order = 0
+	"""Priority of the task, set by :py:meth:`waflib.Runner.Parallel.set_priorities`"""
+
+	cores = 1
+	"""Amount of jobs used by the task when it executes, see :py:meth:`waflib.Runner.Parallel.get_resources`"""
+
+	mem = 0
+	"""Estimated memory used by the task in MB, limited by ``waf --mem-budget``, see :py:meth:`waflib.Runner.Parallel.get_resources`"""
+
 	__slots__ = ('hasrun', 'generator')
 
 	def __init__(self, *k, **kw):
@@ -282,6 +295,7 @@ class TaskBase(evil):
 		except KeyError:
 			pass
 
+		start = time.time()
 		try:
 			ret = self.run()
 		except Exception:
@@ -307,6 +321,8 @@ class TaskBase(evil):
 				self.hasrun = SUCCESS
 		if self.hasrun != SUCCESS:
 			m.error_handler(self)
+		else:
+			m.add_duration(self, time.time() - start)
 
 	def run(self):
 		"""
@@ -747,6 +763,9 @@ class Task(TaskBase):
 
 	The first and second lists in the tuple are stored in :py:attr:`waflib.Build.BuildContext.node_deps` and
 	:py:attr:`waflib.Build.BuildContext.raw_deps` respectively.
+
+	Scanners that only read files and return their results may set the attribute ``parallel = True``
+	so that they are executed by worker processes (see :py:meth:`waflib.Build.BuildContext.scan_tasks`).
 	"""
 
 	def sig_implicit_deps(self):
@@ -785,7 +804,14 @@ class Task(TaskBase):
 			raise Errors.TaskRescan('rescan')
 
 		# no previous run or the signature of the dependencies has changed, rescan the dependencies
-		(bld.node_deps[key], bld.raw_deps[key]) = self.scan()
+		try:
+			(bld.node_deps[key], bld.raw_deps[key]) = bld.scan_results.pop(key)
+		except KeyError:
+			if bld.scan_pending is not None:
+				# see waflib.Build.BuildContext.scan_tasks
+				bld.scan_pending.append(self)
+				raise Errors.TaskNotReady('scanned by a worker process')
+			(bld.node_deps[key], bld.raw_deps[key]) = self.scan()
 		if Logs.verbose:
 			Logs.debug('deps: scanner for %s: %r; unresolved: %r', self, bld.node_deps[key], bld.raw_deps[key])
 
@@ -849,6 +875,22 @@ class Task(TaskBase):
 				if not tsk.hasrun:
 					#print "task is not ready..."
 					raise Errors.TaskNotReady('not ready')
+
+	def get_implicit_nodes(self):
+		"""
+		Returns the implicit dependencies found for the task by the previous build, for the code
+		that must know the files used by the tasks (null builds, remote execution, caches).
+		By default, these are the nodes returned by :py:meth:`waflib.Task.Task.scan`
+		and stored in :py:attr:`waflib.Build.BuildContext.node_deps`; other sources of dependencies
+		(see :py:mod:`waflib.Tools.c_deps`) override this method.
+
+		Nodes may be created, so this must be called from the main thread, or after the
+		task signature was computed.
+
+		:rtype: list of :py:class:`waflib.Node.Node`
+		"""
+		return self.generator.bld.node_deps.get(self.uid(), [])
+
 if sys.hexversion > 0x3000000:
 	def uid(self):
 		try:
@@ -946,6 +988,41 @@ def set_precedence_constraints(tasks):
 			for x in cstr_groups[keys[b]]:
 				x.run_after.update(aval)
 
+def set_group_constraints(prev, tasks):
+	"""
+	Updates the ``run_after`` attribute of the tasks from a build group so that they are executed after
+	the tasks from the previous build groups that produce their inputs, or that precede them through the
+	after/before/ext_out/ext_in attributes. This is used when the build groups are not executed one after
+	the other, see :py:attr:`waflib.Build.BuildContext.pipeline`
+
+	:param prev: tasks from the previous build groups that are not complete yet
+	:type prev: list of :py:class:`waflib.Task.TaskBase`
+	:param tasks: tasks from the build group
+	:type tasks: list of :py:class:`waflib.Task.TaskBase`
+	"""
+	outs = Utils.defaultdict(set)
+	for x in prev:
+		for a in getattr(x, 'outputs', []):
+			outs[id(a)].add(x)
+	for x in tasks:
+		for a in getattr(x, 'inputs', []) + getattr(x, 'dep_nodes', []):
+			if id(a) in outs:
+				x.run_after.update(outs[id(a)])
+
+	cstr_prev = Utils.defaultdict(list)
+	for x in prev:
+		cstr_prev[x.hash_constraints()].append(x)
+	cstr_groups = Utils.defaultdict(list)
+	for x in tasks:
+		cstr_groups[x.hash_constraints()].append(x)
+
+	for lst in cstr_groups.values():
+		for prev_lst in cstr_prev.values():
+			if is_before(prev_lst[0], lst[0]):
+				aval = set(prev_lst)
+				for x in lst:
+					x.run_after.update(aval)
+
 def funex(c):
 	"""
 	Compiles a scriptlet expression into a Python function
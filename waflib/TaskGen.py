@@ -164,6 +164,9 @@ class task_gen(object):
 			return False
 		self.posted = True
 
+		# build cache entries of the tasks from this folder
+		self.bld.load_partition(self.path)
+
 		keys = set(self.meths)
 
 		# add the methods listed in the features
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# encoding: utf-8
+
+"""
+Dependencies of the c/c++ files reported by the compilers (gcc, clang, icc)
+instead of being computed by the preprocessor of :py:mod:`waflib.Tools.c_preproc`::
+
+	def configure(conf):
+		conf.load('compiler_c compiler_cxx c_deps')
+
+The compilers write the headers used by each object file into a .d file
+(-MMD flag, -MD if :py:attr:`waflib.Tools.c_preproc.go_absolute` is set),
+which is read after the compilation. The header paths are stored once
+in :py:attr:`waflib.Build.BuildContext.dep_paths`, and the dependencies
+of each task as binary arrays of indices in this table
+(:py:attr:`waflib.Build.BuildContext.compiler_deps`).
+
+The .d files are read by the consumer threads without taking locks
+or creating nodes, and the signatures of the dependencies found in the
+previous build are computed without running the Python preprocessor.
+They are also declared as task outputs, so that the caches of the task
+outputs and the worker daemons restore them with the object files.
+Since no dependency is known before the first compilation, the headers
+created during the build must be produced before the compilation tasks
+(for example with ``ext_out=['.h']``, see the *ext_in* attribute of
+:py:class:`waflib.Tools.c.c`).
+
+The compilers are checked during the configuration, and the c/c++ tasks
+fall back to the Python preprocessor when the flags are not supported.
+Load this tool after the c/c++ compilers.
+"""
+
+import os, re, array, itertools
+from waflib import Task, Utils, Logs, Errors
+from waflib.TaskGen import feature, after_method
+from waflib.Tools import c_preproc
+
+supported_compilers = ['gcc', 'icc', 'clang']
+"""Compiler names (CC_NAME/CXX_NAME) accepting the -MMD/-MD flags"""
+
+re_splitter = re.compile(r'(?<!\\)\s+')
+"""Split the dependencies by whitespace, except when spaces are escaped"""
+
+re_target = re.compile(r'^(?:[A-Za-z]:)?[^:]*:(?=\s|$)')
+"""Target of a make rule, ending on a colon followed by whitespace (the colons of the drive letters are kept)"""
+
+def parse_deps(txt):
+	"""
+	Extracts the file paths from the make rules written by the compilers, for example::
+
+		main.o: ../src/main.c ../src/a.h \\
+		 /usr/include/stdio.h
+
+	The rules may list all the files at once or repeat the target for each of them,
+	and the phony rules of the headers (-MP flag) have no dependencies.
+
+	:param txt: contents of a .d file
+	:type txt: string
+	:return: the file paths, relative to the folder where the compiler was executed
+	:rtype: list of string
+	"""
+	lst = []
+	for line in txt.replace('\\\n', ' ').splitlines():
+		line = re_target.sub('', line)
+		lst.extend(x.replace('\\ ', ' ') for x in re_splitter.split(line) if x)
+	return lst
+
+def pack(ids):
+	"""
+	:param ids: indices in :py:attr:`waflib.Build.BuildContext.dep_paths`
+	:type ids: list of int
+	:return: the indices as a binary string for the build cache
+	:rtype: bytes
+	"""
+	a = array.array('I', ids)
+	try:
+		return a.tobytes()
+	except AttributeError:
+		return a.tostring()
+
+def unpack(data):
+	"""
+	Reverse of :py:func:`waflib.Tools.c_deps.pack`
+
+	:rtype: array of int
+	"""
+	a = array.array('I')
+	try:
+		a.frombytes(data)
+	except AttributeError:
+		a.fromstring(data)
+	return a
+
+def init_deps(bld):
+	"""
+	Creates the index of the dependency paths, called from the main thread before the first compilation
+	"""
+	bld.dep_index = dict((v, k) for (k, v) in bld.dep_paths.items())
+	bld.dep_counter = itertools.count(max([-1] + list(bld.dep_paths.keys())) + 1)
+	bld.dep_nodes = {}
+	bld.dep_hashes = {}
+
+def get_id(bld, path):
+	"""
+	Returns the index of a path in :py:attr:`waflib.Build.BuildContext.dep_paths`, adding it if necessary.
+	Called by the consumer threads: concurrent additions of the same path waste an index but
+	return the same value, as the dict operations are atomic.
+
+	:param path: absolute path
+	:type path: string
+	:rtype: int
+	"""
+	index = bld.dep_index
+	try:
+		return index[path]
+	except KeyError:
+		idx = index.setdefault(path, next(bld.dep_counter))
+		bld.dep_paths[idx] = path
+		return idx
+
+def get_node(bld, idx):
+	"""
+	Returns the node of a dependency, called from the main thread only since nodes may be created
+
+	:param idx: index in :py:attr:`waflib.Build.BuildContext.dep_paths`
+	:type idx: int
+	:rtype: :py:class:`waflib.Node.Node`
+	"""
+	try:
+		return bld.dep_nodes[idx]
+	except KeyError:
+		node = bld.dep_nodes[idx] = bld.root.make_node(bld.dep_paths[idx])
+		return node
+
+def get_hash(bld, idx):
+	"""
+	Returns the signature of a dependency from the consumer threads, by using the node
+	if it exists already, or by hashing the file otherwise (the node tree is not modified)
+
+	:param idx: index in :py:attr:`waflib.Build.BuildContext.dep_paths`
+	:type idx: int
+	:rtype: string or bytes
+	"""
+	path = bld.dep_paths[idx]
+	node = bld.dep_nodes.get(idx) or bld.root.search_node(path)
+	try:
+		if node:
+			return node.get_bld_sig()
+		try:
+			return bld.dep_hashes[idx]
+		except KeyError:
+			ret = bld.dep_hashes[idx] = Utils.h_file(path)
+			return ret
+	except EnvironmentError:
+		return Utils.SIG_NIL
+
+def read_deps(self):
+	"""
+	Reads the .d file written by the compiler and returns the indices of the dependencies,
+	without the source file. Called by the consumer threads after the compilation.
+
+	:rtype: list of int
+	"""
+	bld = self.generator.bld
+	name = os.path.splitext(self.outputs[0].abspath())[0] + '.d'
+	try:
+		txt = Utils.readf(name)
+	except EnvironmentError:
+		self.hasrun = Task.MISSING
+		self.err_msg = '-> missing file: %r (dependencies reported by the compiler)' % name
+		raise Errors.WafError(self.err_msg)
+
+	cwd = self.get_cwd().abspath()
+	src = self.inputs[0].abspath()
+	ret = []
+	seen = set()
+	for x in parse_deps(txt):
+		x = os.path.normpath(os.path.join(cwd, x))
+		if x != src and not x in seen:
+			seen.add(x)
+			ret.append(get_id(bld, x))
+	return ret
+
+def get_compiler_nodes(self):
+	"""
+	Returns the nodes of the dependencies reported by the compiler in the previous build,
+	see :py:meth:`waflib.Task.Task.get_implicit_nodes`
+
+	:rtype: list of :py:class:`waflib.Node.Node`
+	"""
+	bld = self.generator.bld
+	try:
+		bld.dep_index
+	except AttributeError:
+		init_deps(bld)
+	try:
+		ids = unpack(bld.compiler_deps[self.uid()])
+	except KeyError:
+		return []
+	return [get_node(bld, idx) for idx in ids]
+
+def sig_compiler_deps(self):
+	"""
+	Hashes the signatures of the dependencies reported by the compiler, read from
+	the build cache in the main thread or from the .d file after the compilation
+	(see :py:meth:`waflib.Task.Task.sig_implicit_deps`)
+	"""
+	bld = self.generator.bld
+	upd = self.m.update
+	try:
+		ids = self.dep_ids
+	except AttributeError:
+		pass
+	else:
+		for idx in ids:
+			upd(get_hash(bld, idx))
+		return
+
+	nodes = get_compiler_nodes(self)
+	if not nodes:
+		return
+
+	# headers created by tasks of the current build group
+	try:
+		cache = bld.dct_implicit_nodes
+	except AttributeError:
+		cache = bld.dct_implicit_nodes = {}
+	try:
+		dct = cache[bld.cur]
+	except KeyError:
+		dct = cache[bld.cur] = {}
+		for tsk in bld.cur_tasks:
+			for x in tsk.outputs:
+				dct[x] = tsk
+	for x in nodes:
+		if x in dct:
+			tsk = dct[x]
+			self.run_after.add(tsk)
+			if not tsk.hasrun:
+				raise Errors.TaskNotReady('not ready')
+
+	for x in nodes:
+		try:
+			upd(x.get_bld_sig())
+		except EnvironmentError:
+			# removed header, let the compiler report the error if it is still used
+			upd(Utils.SIG_NIL)
+
+def post_compiler_deps(self):
+	"""
+	Stores the dependencies reported by the compiler and updates the task signature accordingly
+	"""
+	bld = self.generator.bld
+	self.dep_ids = read_deps(self)
+	bld.compiler_deps[self.uid()] = pack(self.dep_ids)
+	if Logs.verbose:
+		Logs.debug('deps: compiler dependencies for %s: %r', self, [bld.dep_paths[x] for x in self.dep_ids])
+	try:
+		del self.cache_sig
+	except AttributeError:
+		pass
+
+def wrap_compiled_task(cls):
+	"""
+	Makes the instances of a task class use the compiler dependencies when
+	the class name is listed in ``env.COMPILER_DEPS``; the subclasses inherit the methods
+	"""
+	if 'compiler_deps' in cls.__dict__:
+		return
+	name = cls.compiler_deps = cls.__name__
+
+	m1 = cls.sig_implicit_deps
+	def sig_implicit_deps(self):
+		if name in self.env.COMPILER_DEPS:
+			return sig_compiler_deps(self)
+		return m1(self)
+	cls.sig_implicit_deps = sig_implicit_deps
+
+	m2 = cls.post_run
+	def post_run(self):
+		if name in self.env.COMPILER_DEPS:
+			post_compiler_deps(self)
+		return m2(self)
+	cls.post_run = post_run
+
+	m3 = cls.get_implicit_nodes
+	def get_implicit_nodes(self):
+		if name in self.env.COMPILER_DEPS:
+			return get_compiler_nodes(self)
+		return m3(self)
+	cls.get_implicit_nodes = get_implicit_nodes
+
+	# the .d files are additional outputs, see add_deps_outputs
+	m4 = cls.keyword
+	def keyword(self):
+		if name in self.env.COMPILER_DEPS:
+			return 'Compiling'
+		return m4(self)
+	cls.keyword = keyword
+
+for k in ('c', 'cxx'):
+	if k in Task.classes:
+		wrap_compiled_task(Task.classes[k])
+
+@feature('c', 'cxx')
+@after_method('process_source')
+def add_deps_outputs(self):
+	"""
+	Declares the .d files as outputs of the compilation tasks using the compiler dependencies,
+	so that they are restored along with the object files by the caches of the task outputs
+	(wafcache, netcache) and sent back by the worker daemons
+	"""
+	for tsk in getattr(self, 'compiled_tasks', []):
+		if getattr(tsk, 'compiler_deps', None) in self.env.COMPILER_DEPS and len(tsk.outputs) == 1:
+			tsk.outputs.append(tsk.outputs[0].change_ext('.d'))
+
+def configure(conf):
+	flags = conf.env.COMPILER_DEPS_FLAGS or (c_preproc.go_absolute and ['-MD'] or ['-MMD'])
+	for (lang, name, var) in (('c', 'CC_NAME', 'CFLAGS'), ('cxx', 'CXX_NAME', 'CXXFLAGS')):
+		if not conf.env[name] in supported_compilers:
+			continue
+		kw = {var.lower(): flags}
+		try:
+			conf.check(fragment='int main() { return 0; }', features=lang, msg='Checking for %s dependency flags %r' % (lang, ' '.join(flags)), **kw)
+		except Errors.ConfigurationError:
+			pass
+		else:
+			conf.env.append_value(var, flags)
+			conf.env.append_unique('COMPILER_DEPS', lang)
@@ -72,6 +72,9 @@ re_lines = re.compile(
 	re.IGNORECASE | re.MULTILINE)
 """Match #include lines"""
 
+keywords = dict((x, x) for x in 'ifdef ifndef if else elif endif include import define undef pragma'.split())
+"""Shared keyword strings, which make the lists of directives stored in the build cache smaller"""
+
 re_mac = re.compile("^[a-zA-Z_]\w*")
 """Match macro definitions"""
 
@@ -147,11 +150,14 @@ Operator precendence rules required for parsing expressions of the form::
 
 	#if 1 && 2 != 0
 """
-ops = ['* / %', '+ -', '<< >>', '< <= >= >', '== !=', '& | ^', '&& ||', ',']
+ops = ['* / %', '+ -', '<< >>', '< <= >= >', '== !=', '&', '^', '|', '&&', '||', '?', ',']
 for x, syms in enumerate(ops):
 	for u in syms.split():
 		prec[u] = x
 
+op_alias = {'and': '&&', 'or': '||', 'bitand': '&', 'bitor': '|', 'xor': '^', 'not_eq': '!=', 'not': '!', 'compl': '~'}
+"""Operators of :py:attr:`waflib.Tools.c_preproc.g_optrans` in the expressions evaluated by :py:func:`waflib.Tools.c_preproc.get_term`"""
+
 def trimquotes(s):
 	"""
 	Remove the single quotes around an expression::
@@ -168,6 +174,17 @@ def trimquotes(s):
 	if s[0] == "'" and s[-1] == "'": return s[1:-1]
 	return s
 
+def c_div(a, b):
+	"""
+	Integer division rounded towards zero as in C
+
+	:rtype: int
+	"""
+	c = abs(a) // abs(b)
+	if (a < 0) != (b < 0):
+		return -c
+	return c
+
 def reduce_nums(val_1, val_2, val_op):
 	"""
 	Apply arithmetic rules to compute a result
@@ -189,11 +206,11 @@ def reduce_nums(val_1, val_2, val_op):
 	except TypeError: b = int(val_2)
 
 	d = val_op
-	if d == '%':  c = a%b
+	if d == '%':  c = a - b * c_div(a, b)
 	elif d=='+':  c = a+b
 	elif d=='-':  c = a-b
 	elif d=='*':  c = a*b
-	elif d=='/':  c = a/b
+	elif d=='/':  c = c_div(a, b)
 	elif d=='^':  c = a^b
 	elif d=='==': c = int(a == b)
 	elif d=='|'  or d == 'bitor':  c = a|b
@@ -220,117 +237,119 @@ def get_num(lst):
 	:return: a pair containing the number and the rest of the list
 	:rtype: tuple(value, list)
 	"""
-	if not lst: raise PreprocError('empty list for get_num')
-	(p, v) = lst[0]
-	if p == OP:
-		if v == '(':
-			count_par = 1
-			i = 1
-			while i < len(lst):
-				(p, v) = lst[i]
-
-				if p == OP:
-					if v == ')':
-						count_par -= 1
-						if count_par == 0:
-							break
-					elif v == '(':
-						count_par += 1
-				i += 1
-			else:
-				raise PreprocError('rparen expected %r' % lst)
-
-			(num, _) = get_term(lst[1:i])
-			return (num, lst[i+1:])
-
-		elif v == '+':
-			return get_num(lst[1:])
-		elif v == '-':
-			num, lst = get_num(lst[1:])
-			return (reduce_nums('-1', num, '*'), lst)
-		elif v == '!':
-			num, lst = get_num(lst[1:])
-			return (int(not int(num)), lst)
-		elif v == '~':
-			num, lst = get_num(lst[1:])
-			return (~ int(num), lst)
-		else:
-			raise PreprocError('Invalid op token %r for get_num' % lst)
-	elif p == NUM:
-		return v, lst[1:]
-	elif p == IDENT:
-		# all macros should have been replaced, remaining identifiers eval to 0
-		return 0, lst[1:]
-	else:
-		raise PreprocError('Invalid token %r for get_num' % lst)
+	(num, i) = parse_num(lst, 0, True)
+	return (num, lst[i:])
 
 def get_term(lst):
 	"""
-	Evaluate an expression recursively, for example::
+	Evaluate an expression, for example::
 
-		1+1+1 -> 2+1 -> 3
+		1+1+1 -> 3
 
 	:param lst: list of tokens
 	:type lst: list of tuple(token, value)
 	:return: the value and the remaining tokens
 	:rtype: value, list
 	"""
+	(num, i) = parse_expr(lst, 0, prec[','], True)
+	if i < len(lst):
+		raise PreprocError('cannot reduce %r' % lst)
+	return (num, [])
 
-	if not lst: raise PreprocError('empty list for get_term')
-	num, lst = get_num(lst)
-	if not lst:
-		return (num, [])
-	(p, v) = lst[0]
-	if p == OP:
-		if v == ',':
-			# skip
-			return get_term(lst[1:])
-		elif v == '?':
-			count_par = 0
-			i = 1
-			while i < len(lst):
-				(p, v) = lst[i]
-
-				if p == OP:
-					if v == ')':
-						count_par -= 1
-					elif v == '(':
-						count_par += 1
-					elif v == ':':
-						if count_par == 0:
-							break
-				i += 1
-			else:
+def parse_num(lst, i, ev):
+	"""
+	Evaluates a number, a unary operation or an expression in parentheses, used by :py:func:`waflib.Tools.c_preproc.parse_expr`
+
+	:param lst: list of tokens
+	:type lst: list of tuple(token, value)
+	:param i: position of the first token
+	:type i: int
+	:param ev: whether the operations are evaluated (the operands of *&&*, *||* and *?:* are skipped as in C)
+	:type ev: bool
+	:return: the value and the position of the next token
+	:rtype: tuple(int, int)
+	"""
+	try:
+		(p, v) = lst[i]
+	except IndexError:
+		raise PreprocError('empty list for get_num')
+	if p == NUM:
+		return (int(v), i + 1)
+	elif p == IDENT:
+		# all macros should have been replaced, remaining identifiers eval to 0
+		return (0, i + 1)
+	elif p == OP:
+		v = op_alias.get(v, v)
+		if v == '(':
+			(num, i) = parse_expr(lst, i + 1, prec[','], ev)
+			if i >= len(lst) or lst[i][1] != ')':
 				raise PreprocError('rparen expected %r' % lst)
+			return (num, i + 1)
+		(num, i) = parse_num(lst, i + 1, ev)
+		if v == '+':
+			return (num, i)
+		elif v == '-':
+			return (-num, i)
+		elif v == '!':
+			return (int(not num), i)
+		elif v == '~':
+			return (~num, i)
+	raise PreprocError('Invalid token %r for get_num' % lst)
 
-			if int(num):
-				return get_term(lst[1:i])
-			else:
-				return get_term(lst[i+1:])
+def parse_expr(lst, i, level, ev):
+	"""
+	Evaluates the binary operations of precedence *level* or higher (see :py:attr:`waflib.Tools.c_preproc.prec`),
+	used by :py:func:`waflib.Tools.c_preproc.get_term`
 
+	:param lst: list of tokens
+	:type lst: list of tuple(token, value)
+	:param i: position of the first token
+	:type i: int
+	:param level: lowest precedence to process
+	:type level: int
+	:param ev: whether the operations are evaluated
+	:type ev: bool
+	:return: the value and the position of the next token
+	:rtype: tuple(int, int)
+	"""
+	(num, i) = parse_num(lst, i, ev)
+	n = len(lst)
+	while i < n:
+		(p, v) = lst[i]
+		if p != OP:
+			raise PreprocError('op expected %r' % lst)
+		v = op_alias.get(v, v)
+		try:
+			x = prec[v]
+		except KeyError:
+			# closing parenthesis or colon
+			break
+		if x > level:
+			break
+		if v == '?':
+			(num2, i) = parse_expr(lst, i + 1, prec[','], ev and num)
+			if i >= n or lst[i][1] != ':':
+				raise PreprocError('colon expected %r' % lst)
+			(num3, i) = parse_expr(lst, i + 1, x, ev and not num)
+			if num:
+				num = num2
+			else:
+				num = num3
+		elif v == '&&':
+			(num2, i) = parse_expr(lst, i + 1, x - 1, ev and num)
+			num = int(bool(num and num2))
+		elif v == '||':
+			(num2, i) = parse_expr(lst, i + 1, x - 1, ev and not num)
+			num = int(bool(num or num2))
+		elif v == ',':
+			(num, i) = parse_expr(lst, i + 1, x - 1, ev)
 		else:
-			num2, lst = get_num(lst[1:])
-
-			if not lst:
-				# no more tokens to process
-				num2 = reduce_nums(num, num2, v)
-				return get_term([(NUM, num2)] + lst)
-
-			# operator precedence
-			p2, v2 = lst[0]
-			if p2 != OP:
-				raise PreprocError('op expected %r' % lst)
-
-			if prec[v2] >= prec[v]:
-				num2 = reduce_nums(num, num2, v)
-				return get_term([(NUM, num2)] + lst)
+			(num2, i) = parse_expr(lst, i + 1, x - 1, ev)
+			if ev:
+				num = reduce_nums(num, num2, v)
 			else:
-				num3, lst = get_num(lst[1:])
-				num3 = reduce_nums(num2, num3, v2)
-				return get_term([(NUM, num), (p, v), (NUM, num3)] + lst)
-
-
-	raise PreprocError('cannot reduce %r' % lst)
+				num = 0
+	return (num, i)
 
 def reduce_eval(lst):
 	"""
@@ -430,9 +449,8 @@ def reduce_tokens(lst, defs, ban=[]):
 				del lst[i]
 				accu = to_add[:]
 				reduce_tokens(accu, defs, ban+[v])
-				for tmp in accu:
-					lst.insert(i, tmp)
-					i += 1
+				lst[i:i] = accu
+				i += len(accu)
 			else:
 				# collect the arguments for the funcall
 
@@ -545,13 +563,16 @@ def reduce_tokens(lst, defs, ban=[]):
 
 
 				reduce_tokens(accu, defs, ban+[v])
-
-				for x in range(len(accu)-1, -1, -1):
-					lst.insert(i, accu[x])
+				lst[i:i] = accu
 
 		i += 1
 
 
+not_tok = (OP, '!')
+defined_tok = (IDENT, 'defined')
+lpar_tok = (OP, '(')
+rpar_tok = (OP, ')')
+
 def eval_macro(lst, defs):
 	"""
 	Reduce the tokens by :py:func:`waflib.Tools.c_preproc.reduce_tokens` and try to return a 0/1 result by :py:func:`waflib.Tools.c_preproc.reduce_eval`.
@@ -562,11 +583,38 @@ def eval_macro(lst, defs):
 	:type defs: dict
 	:rtype: int
 	"""
+	# common conditions such as "#if 0", "#if FOO" or "#if !defined(FOO)"
+	n = len(lst)
+	if n == 1:
+		(p, v) = lst[0]
+		if p == NUM:
+			return int(v) != 0
+		elif p == IDENT and v != 'defined' and not v in defs:
+			return False
+	elif 1 < n < 6:
+		neg = lst[0] == not_tok
+		k = int(neg)
+		if lst[k] == defined_tok:
+			if n == k + 2:
+				(p, v) = lst[k + 1]
+			elif n == k + 4 and lst[k + 1] == lpar_tok and lst[k + 3] == rpar_tok:
+				(p, v) = lst[k + 2]
+			else:
+				p = None
+			if p == IDENT:
+				return (v in defs) != neg
+
 	reduce_tokens(lst, defs, [])
 	if not lst: raise PreprocError('missing tokens to evaluate')
 	(p, v) = reduce_eval(lst)
 	return int(v) != 0
 
+macro_cache = Utils.lru_cache(10000)
+"""
+Macro definitions parsed by :py:func:`waflib.Tools.c_preproc.extract_macro`, shared by all the parsers
+as the results are never modified
+"""
+
 def extract_macro(txt):
 	"""
 	Process a macro definition of the form::
@@ -579,6 +627,13 @@ def extract_macro(txt):
 	:return: a tuple containing the name, the list of arguments and the replacement
 	:rtype: tuple(string, [list, list])
 	"""
+	try:
+		return macro_cache[txt]
+	except KeyError:
+		ret = macro_cache[txt] = extract_macro_private(txt)
+		return ret
+
+def extract_macro_private(txt):
 	t = tokenize(txt)
 	if re_fun.search(txt):
 		p, name = t[0]
@@ -698,6 +753,9 @@ def parse_char(txt):
 		try: return chr_esc[c]
 		except KeyError: raise PreprocError('could not parse char literal %r' % txt)
 
+tokenize_cache = Utils.lru_cache(10000)
+"""Tokens of the preprocessor lines, the same #if conditions and macro bodies occur in many headers"""
+
 def tokenize(s):
 	"""
 	Convert a string into a list of tokens (shlex.split does not apply to c/c++/d)
@@ -707,7 +765,11 @@ def tokenize(s):
 	:return: a list of tokens
 	:rtype: list of tuple(token, value)
 	"""
-	return tokenize_private(s)[:] # force a copy of the results
+	try:
+		ret = tokenize_cache[s]
+	except KeyError:
+		ret = tokenize_cache[s] = tokenize_private(s)
+	return ret[:] # force a copy of the results
 
 def tokenize_private(s):
 	ret = []
@@ -761,6 +823,48 @@ def format_defines(lst):
 				raise ValueError('Invalid define expression %r' % y)
 	return ret
 
+class macro_dict(dict):
+	"""
+	Macro definitions of :py:class:`waflib.Tools.c_preproc.c_parser`. The lookups and the changes are
+	appended to :py:attr:`waflib.Tools.c_preproc.macro_dict.log` so that the include closures of the headers
+	can be memoized along with the macros that influence them (see :py:meth:`waflib.Tools.c_preproc.c_parser.store_closure`).
+	The macro definitions are parsed on first access.
+	"""
+	__slots__ = ('log',)
+
+	def __contains__(self, name):
+		ret = dict.__contains__(self, name)
+		self.log.append(('d', name, ret))
+		return ret
+
+	def __getitem__(self, name):
+		ret = self.value(name)
+		self.log.append(('v', name, ret))
+		return ret
+
+	def __setitem__(self, name, line):
+		self.log.append(('w', name, line))
+		dict.__setitem__(self, name, line)
+
+	def __delitem__(self, name):
+		self.log.append(('w', name, None))
+		dict.__delitem__(self, name)
+
+	def value(self, name):
+		"""
+		Returns a macro definition without recording the lookup
+
+		:param name: macro name
+		:type name: string
+		:return: the macro arguments and replacement, see :py:func:`waflib.Tools.c_preproc.extract_macro`
+		:rtype: list
+		"""
+		ret = dict.__getitem__(self, name)
+		if isinstance(ret, str):
+			ret = extract_macro(ret)[1]
+			dict.__setitem__(self, name, ret)
+		return ret
+
 class c_parser(object):
 	"""
 	Used by :py:func:`waflib.Tools.c_preproc.scan` to parse c/h files. Note that by default,
@@ -771,11 +875,20 @@ class c_parser(object):
 		"""list of lines read"""
 
 		if defines is None:
-			self.defs  = {}
+			self.defs  = macro_dict()
 		else:
-			self.defs  = dict(defines) # make a copy
+			self.defs  = macro_dict(defines) # make a copy
 		self.state = []
 
+		self.log = self.defs.log = []
+		"""Macro lookups and changes, bans and names added while reading the headers, see :py:meth:`waflib.Tools.c_preproc.c_parser.store_closure`"""
+
+		self.frames = []
+		"""Headers being read whose include closures may be memoized"""
+
+		self.closures = None
+		"""Include closures memoized by header and include paths, set by :py:meth:`waflib.Tools.c_preproc.c_parser.start`"""
+
 		self.count_files = 0
 		self.currentnode_stack = []
 
@@ -830,7 +943,8 @@ class c_parser(object):
 		Try to obtain a node from the filename based from the include paths. Will add
 		the node found to :py:attr:`waflib.Tools.c_preproc.c_parser.nodes` or the file name to
 		:py:attr:`waflib.Tools.c_preproc.c_parser.names` if no corresponding file is found. Called by
-		:py:attr:`waflib.Tools.c_preproc.c_parser.start`.
+		:py:attr:`waflib.Tools.c_preproc.c_parser.start`. The include closure of a header is replayed
+		instead of being read again when the macros it depends on have the same values (see :py:meth:`waflib.Tools.c_preproc.c_parser.store_closure`).
 
 		:param filename: header to find
 		:type filename: string
@@ -841,9 +955,14 @@ class c_parser(object):
 			# we could let the qt4 module use a subclass, but then the function "scan" below must be duplicated
 			# in the qt4 and in the qt5 classes. So we have two lines here and it is sufficient. TODO waf 1.9
 			self.names.append(filename)
+			self.log.append(('n', filename, False))
+			self.current_file = None
 			return None
 
 		self.curfile = filename
+		if not self.frames:
+			# the lookups of the source file are irrelevant
+			del self.log[:]
 
 		# for msvc it should be a for loop over the whole stack
 		found = self.cached_find_resource(self.currentnode_stack[-1], filename)
@@ -853,15 +972,136 @@ class c_parser(object):
 				break
 			found = self.cached_find_resource(n, filename)
 
-		if found and not found in self.ban_includes:
+		banned = False
+		if found:
+			banned = found in self.ban_includes
+			self.log.append(('b', found, banned))
+		self.current_file = found
+
+		if found and not banned:
+			if self.closures is None:
+				key = None
+			else:
+				key = (found, self.nodepaths_key)
+				if self.replay_closure(key):
+					return found
 			# TODO duplicates do not increase the no-op build times too much, but they may be worth removing
 			self.nodes.append(found)
-			self.addlines(found)
+			frame = [key, len(self.log), len(self.nodes) - 1, len(self.state), len(self.currentnode_stack) + 1]
+			count = len(self.lines)
+			try:
+				self.addlines(found)
+			except PreprocError:
+				self.drop_closures()
+				raise
+			if len(self.lines) == count:
+				# the file could not be parsed
+				self.drop_closures()
+			elif key:
+				self.frames.append(frame)
 		else:
 			if not filename in self.names:
 				self.names.append(filename)
+			self.log.append(('n', filename, True))
 		return found
 
+	def drop_closures(self):
+		"""
+		Prevents the memoization of the headers being read, for example when the recursion limit is exceeded
+		"""
+		for frame in self.frames:
+			frame[0] = None
+
+	def store_closure(self, frame):
+		"""
+		Memoizes the include closure of a header once its lines are processed. The entry records the
+		macros and the bans (#pragma once) that were looked up before being changed by the header or by
+		the files it includes, and the resulting changes: nodes found, names not found, macros, bans and current file.
+
+		:param frame: header key and positions in :py:attr:`waflib.Tools.c_preproc.c_parser.log`, :py:attr:`waflib.Tools.c_preproc.c_parser.nodes` and in the state
+		:type frame: list
+		"""
+		(key, log_pos, nodes_pos, depth, stack_len) = frame
+		if key is None or len(self.state) != depth:
+			# unbalanced #if/#endif
+			return
+
+		inputs = []
+		changes = []
+		outputs = {}
+		seen = set()
+		for ev in self.log[log_pos:]:
+			(kind, name, val) = ev
+			if kind == 'w':
+				seen.add(('d', name))
+				seen.add(('v', name))
+				outputs[name] = val
+			elif kind == 'B':
+				seen.add(('b', name))
+				changes.append(ev)
+			elif kind == 'n':
+				changes.append(ev)
+			elif not (kind, name) in seen:
+				seen.add((kind, name))
+				inputs.append(ev)
+
+		try:
+			entries = self.closures[key]
+		except KeyError:
+			entries = self.closures[key] = []
+		if len(entries) < 16:
+			entries.append((inputs, list(outputs.items()), changes, self.nodes[nodes_pos:], self.current_file))
+
+	def replay_closure(self, key):
+		"""
+		Applies a memoized include closure instead of reading the header again, see :py:meth:`waflib.Tools.c_preproc.c_parser.store_closure`
+
+		:param key: header and include paths
+		:type key: tuple
+		:return: True if an entry matches the current macros and bans
+		:rtype: bool
+		"""
+		try:
+			entries = self.closures[key]
+		except KeyError:
+			return False
+
+		defs = self.defs
+		bans = self.ban_includes
+		for (inputs, outputs, changes, nodes, current) in entries:
+			for (kind, name, val) in inputs:
+				if kind == 'd':
+					if dict.__contains__(defs, name) != val:
+						break
+				elif kind == 'v':
+					try:
+						if defs.value(name) != val:
+							break
+					except (KeyError, PreprocError):
+						break
+				elif (name in bans) != val:
+					break
+			else:
+				log = self.log
+				log.extend(inputs)
+				self.nodes.extend(nodes)
+				for (name, val) in outputs:
+					log.append(('w', name, val))
+					if val is None:
+						dict.pop(defs, name, None)
+					else:
+						dict.__setitem__(defs, name, val)
+				log.extend(changes)
+				names = self.names
+				for (kind, name, val) in changes:
+					if kind == 'B':
+						bans.add(name)
+					elif not val or not name in names:
+						names.append(name)
+				self.current_file = current
+				return True
+		return False
+
 	def filter_comments(self, node):
 		"""
 		Filter the comments from a c/h file, and return the preprocessor lines.
@@ -879,17 +1119,50 @@ class c_parser(object):
 		return re_lines.findall(code)
 
 	def parse_lines(self, node):
+		"""
+		Returns the preprocessor directives of a file in reverse order, preceded by :py:const:`waflib.Tools.c_preproc.POPFILE`.
+		The lists are kept across builds along with the file signatures in ``bld.scan_cache`` (see :py:attr:`waflib.Build.BuildContext.scan_cache`),
+		so that the headers are only read and filtered again when their contents change.
+
+		:param node: c/h file
+		:type node: :py:class:`waflib.Node.Node`
+		:return: the preprocessor directives as a list of (keyword, line)
+		:rtype: a list of string pairs
+		"""
+		bld = node.ctx
 		try:
-			cache = node.ctx.preproc_cache_lines
+			cache = bld.preproc_cache_lines
 		except AttributeError:
-			cache = node.ctx.preproc_cache_lines = Utils.lru_cache(1000)
+			cache = bld.preproc_cache_lines = Utils.lru_cache(1000)
 		try:
 			return cache[node]
 		except KeyError:
-			cache[node] = lines = self.filter_comments(node)
-			lines.append((POPFILE, ''))
-			lines.reverse()
-			return lines
+			pass
+
+		try:
+			db = bld.scan_cache
+		except AttributeError:
+			db = None
+		else:
+			bld.load_partition('scan_cache')
+			db = bld.scan_cache
+			sig = node.get_bld_sig()
+			try:
+				(prev, lines) = db[node]
+			except KeyError:
+				pass
+			else:
+				if prev == sig:
+					cache[node] = lines
+					return lines
+
+		lines = [(keywords.get(x, x), y) for (x, y) in self.filter_comments(node)]
+		lines.append((POPFILE, ''))
+		lines.reverse()
+		cache[node] = lines
+		if db is not None:
+			db[node] = (sig, lines)
+		return lines
 
 	def addlines(self, node):
 		"""
@@ -932,6 +1205,12 @@ class c_parser(object):
 		Logs.debug('preproc: scanning %s (in %s)', node.name, node.parent.name)
 
 		self.current_file = node
+		if isinstance(self.defs, macro_dict):
+			try:
+				self.closures = node.ctx.preproc_cache_closures
+			except AttributeError:
+				self.closures = node.ctx.preproc_cache_closures = Utils.lru_cache(10000)
+			self.nodepaths_key = tuple(self.nodepaths)
 		self.addlines(node)
 
 		# macros may be defined on the command-line, so they must be parsed as if they were part of the file
@@ -945,6 +1224,8 @@ class c_parser(object):
 			if token == POPFILE:
 				self.count_files -= 1
 				self.currentnode_stack.pop()
+				if self.frames and self.frames[-1][4] > len(self.currentnode_stack):
+					self.store_closure(self.frames.pop())
 				continue
 
 			try:
@@ -979,9 +1260,10 @@ class c_parser(object):
 					(kind, inc) = extract_include(line, self.defs)
 					if ve: Logs.debug('preproc: include found %s    (%s) ', inc, kind)
 					if kind == '"' or not strict_quotes:
-						self.current_file = self.tryfind(inc)
+						found = self.tryfind(inc)
 						if token == 'import':
-							self.ban_includes.add(self.current_file)
+							self.ban_includes.add(found)
+							self.log.append(('B', found, None))
 				elif token == 'elif':
 					if state[-1] == accepted:
 						state[-1] = skipped
@@ -1004,6 +1286,7 @@ class c_parser(object):
 				elif token == 'pragma':
 					if re_pragma_once.match(line.lower()):
 						self.ban_includes.add(self.current_file)
+						self.log.append(('B', self.current_file, None))
 			except Exception as e:
 				if Logs.verbose:
 					Logs.debug('preproc: line parsing failed (%s): %s %s', e, line, Utils.ex_stack())
@@ -1042,3 +1325,6 @@ def scan(task):
 	tmp.start(task.inputs[0], task.env)
 	return (tmp.nodes, tmp.names)
 
+scan.parallel = True
+"""The dependencies may be scanned by worker processes, see :py:meth:`waflib.Build.BuildContext.scan_tasks`"""
+
@@ -204,3 +204,6 @@ def scan(self):
 	names = gruik.names
 	return (nodes, names)
 
+scan.parallel = True
+"""The dependencies may be scanned by worker processes, see :py:meth:`waflib.Build.BuildContext.scan_tasks`"""
+
@@ -60,6 +60,7 @@ class fc(Task.Task):
 		tmp.task = self
 		tmp.start(self.inputs[0])
 		return (tmp.nodes, tmp.names)
+	scan.parallel = True
 
 	def runnable_status(self):
 		"""
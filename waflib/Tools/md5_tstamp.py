@@ -9,6 +9,8 @@ The hashes can also reflect either the file contents (STRONGEST=True) or the
 file time and file size.
 
 The performance benefits of this module are usually insignificant.
+The build context now reuses the file hashes by default,
+see :py:meth:`waflib.Node.Node.h_file_cached`.
 """
 
 import os, stat
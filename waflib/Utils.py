@@ -9,7 +9,7 @@ The portability fixes try to provide a consistent behavior of the Waf API
 through Python versions 2.5 to 3.X and across different platforms (win32, linux, etc)
 """
 
-import os, sys, errno, traceback, inspect, re, datetime, platform, base64
+import os, sys, errno, traceback, inspect, re, datetime, platform, struct, functools
 try:
 	import cPickle
 except ImportError:
@@ -45,6 +45,34 @@ except ImportError:
 		# never fail to enable fixes from another module
 		pass
 
+hash_algorithms = {}
+"""
+Hash functions available for the file and task signatures, see :py:func:`waflib.Utils.set_hash`.
+The digests must be 16 bytes long like md5 digests, as :py:func:`waflib.Utils.md5` is also
+used for other purposes such as the project GUIDs of the msvs and codelite extensions.
+"""
+try:
+	hash_algorithms['md5'] = md5
+except NameError:
+	pass
+try:
+	from hashlib import blake2b
+except ImportError:
+	pass
+else:
+	hash_algorithms['blake2b'] = functools.partial(blake2b, digest_size=16)
+try:
+	import xxhash
+except ImportError:
+	pass
+else:
+	# non-cryptographic, see https://github.com/ifduyue/python-xxhash
+	if hasattr(xxhash, 'xxh3_128'):
+		hash_algorithms['xxh3_128'] = xxhash.xxh3_128
+
+hash_algorithm = 'md5'
+"""Name of the hash function bound to :py:func:`waflib.Utils.md5`"""
+
 try:
 	import threading
 except ImportError:
@@ -238,10 +266,33 @@ def writef(fname, data, m='w', encoding='ISO8859-1'):
 	finally:
 		f.close()
 
+def set_hash(name):
+	"""
+	Selects the hash function used for the file and task signatures (:py:func:`waflib.Utils.h_file`,
+	:py:func:`waflib.Utils.h_list`, :py:meth:`waflib.Task.Task.signature`, etc). The function is
+	bound to :py:func:`waflib.Utils.md5` for compatibility, whatever the algorithm. The algorithm
+	is set at configuration time (``waf configure --hash-algorithm=blake2b``) and recorded in the
+	build cache, see :py:meth:`waflib.Build.BuildContext.restore`.
+
+	:param name: key in :py:const:`waflib.Utils.hash_algorithms`
+	:type name: string
+	:raises: :py:class:`waflib.Errors.WafError` if the algorithm is not available or if its digests are not 16 bytes long
+	"""
+	global md5, hash_algorithm
+	try:
+		fun = hash_algorithms[name]
+	except KeyError:
+		raise Errors.WafError('The hash algorithm %r is not available (use one of %r)' % (name, sorted(hash_algorithms.keys())))
+	if len(fun().digest()) != 16:
+		raise Errors.WafError('The hash algorithm %r must return 16-byte digests' % name)
+	md5 = fun
+	hash_algorithm = name
+
 def h_file(fname):
 	"""
-	Computes a hash value for a file by using md5. Use the md5_tstamp
-	extension to get faster build hashes if necessary.
+	Computes a hash value for a file by using :py:func:`waflib.Utils.md5` (see
+	:py:func:`waflib.Utils.set_hash`). Use the md5_tstamp extension to get
+	faster build hashes if necessary.
 
 	:type fname: string
 	:param fname: path to the file to hash
@@ -804,6 +855,20 @@ process_pool = []
 List of processes started to execute sub-process commands
 """
 
+process_envs = {}
+"""
+Maps the environments given to the pre-forked processes to integer ids, so that they
+are sent only once to each process, see :py:func:`waflib.Utils.run_prefork_process`
+"""
+
+process_lock = threading.Lock()
+
+PROCESS_HEADER = '!cI'
+"""
+Framing of the messages exchanged with the pre-forked processes: message kind (1 byte) and payload size.
+The kinds are 'E' (environment), 'C' (command), 'O' (stdout), 'R' (stderr) and 'S' (status).
+"""
+
 def get_process():
 	"""
 	Returns a process object that can execute commands as sub-processes
@@ -815,16 +880,67 @@ def get_process():
 	except IndexError:
 		filepath = os.path.dirname(os.path.abspath(__file__)) + os.sep + 'processor.py'
 		cmd = [sys.executable, '-c', readf(filepath)]
-		return subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE, bufsize=0)
+		proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.PIPE, bufsize=-1)
+		proc.envs = set([0])
+		return proc
+
+def get_process_env(env):
+	"""
+	Returns the id representing an environment in the pre-forked processes
+
+	:param env: environment variables, or None for the environment of the pre-forked process
+	:type env: dict
+	:rtype: int
+	"""
+	if env is None:
+		return 0
+	key = tuple(sorted(env.items()))
+	try:
+		return process_envs[key]
+	except KeyError:
+		process_lock.acquire()
+		try:
+			return process_envs.setdefault(key, len(process_envs) + 1)
+		finally:
+			process_lock.release()
+
+def write_frame(stream, kind, data):
+	"""
+	Writes a message to a pre-forked process, see :py:const:`waflib.Utils.PROCESS_HEADER`
+	"""
+	stream.write(struct.pack(PROCESS_HEADER, kind, len(data)))
+	stream.write(data)
+
+def read_frame(stream):
+	"""
+	Reads a message from a pre-forked process, see :py:const:`waflib.Utils.PROCESS_HEADER`
+
+	:return: a tuple (kind, payload)
+	:raise: IOError if the process died
+	"""
+	size = struct.calcsize(PROCESS_HEADER)
+	head = stream.read(size)
+	if len(head) < size:
+		raise IOError('Incomplete message')
+	kind, size = struct.unpack(PROCESS_HEADER, head)
+	data = stream.read(size)
+	if len(data) < size:
+		raise IOError('Incomplete message')
+	return kind, data
 
 def run_prefork_process(cmd, kwargs, cargs):
 	"""
 	Delegates process execution to a pre-forked process instance.
+	The environments are sent once per process and then referenced by id,
+	and the process outputs are returned without additional encoding.
 	"""
 	if not 'env' in kwargs:
 		kwargs['env'] = dict(os.environ)
+	kw = dict(kwargs)
+	env = kw.pop('env')
 	try:
-		obj = base64.b64encode(cPickle.dumps([cmd, kwargs, cargs]))
+		env_id = get_process_env(env)
+		obj = cPickle.dumps([cmd, kw, cargs, env_id], -1)
 	except TypeError:
 		return run_regular_process(cmd, kwargs, cargs)
 
@@ -832,15 +948,26 @@ def run_prefork_process(cmd, kwargs, cargs):
 	if not proc:
 		return run_regular_process(cmd, kwargs, cargs)
 
-	proc.stdin.write(obj)
-	proc.stdin.write('\n'.encode())
-	proc.stdin.flush()
-	obj = proc.stdout.readline()
-	if not obj:
+	out = err = None
+	try:
+		if not env_id in proc.envs:
+			write_frame(proc.stdin, b'E', cPickle.dumps([env_id, env], -1))
+			proc.envs.add(env_id)
+		write_frame(proc.stdin, b'C', obj)
+		proc.stdin.flush()
+		while 1:
+			kind, data = read_frame(proc.stdout)
+			if kind == b'O':
+				out = data
+			elif kind == b'R':
+				err = data
+			else:
+				break
+	except (OSError, IOError):
 		raise OSError('Preforked sub-process %r died' % proc.pid)
 
 	process_pool.append(proc)
-	ret, out, err, ex, trace = cPickle.loads(base64.b64decode(obj))
+	ret, pout, perr, ex, trace = cPickle.loads(data)
 	if ex:
 		if ex == 'OSError':
 			raise OSError(trace)
@@ -848,6 +975,10 @@ def run_prefork_process(cmd, kwargs, cargs):
 			raise ValueError(trace)
 		else:
 			raise Exception(trace)
+	if out is None:
+		out = pout
+	if err is None:
+		err = perr
 	return ret, out, err
 
 def run_regular_process(cmd, kwargs, cargs={}):
@@ -0,0 +1,351 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+"""
+Alternative task execution engine built on asyncio (Python 3).
+
+The default scheduler (:py:class:`waflib.Runner.Spawner`) keeps one thread per job,
+so that ``waf -j256`` means 256 threads busy waiting on processes and competing for
+the GIL. This tool runs the commands declared through ``run_str`` from a single
+event loop instead, so that the amount of concurrent processes is no longer tied
+to the amount of threads::
+
+	def options(opt):
+		opt.load('asyncio_runner')
+	def build(bld):
+		...
+
+	$ waf build -j256 --async-threads=4
+
+Only the tasks whose ``run`` method was generated from a single ``run_str`` string
+(compilers, linkers, most rule-based tasks) are executed from the event loop. All
+other tasks (Python functions, custom ``run`` methods, commands that need an @argfile)
+are processed by a small pool of threads, so that the ``Task.run()``/``exec_command``
+contract remains the same for existing code.
+
+The commands executed from the event loop do not go through
+:py:meth:`waflib.Task.TaskBase.process`, so this tool cannot be used with
+:py:mod:`waflib.extras.jobserver` (the job slots would not be held by the tasks);
+the builds stop with an error when both tools are loaded.
+"""
+
+import os, sys, time
+from waflib import Runner, Task, Context, Options, Utils, Logs, Errors
+
+try:
+	import asyncio, concurrent.futures
+except ImportError:
+	asyncio = None
+
+def options(opt):
+	opt.add_option('--async-threads', type='int', default=0, dest='async_threads',
+		help='amount of threads for executing the Python tasks [Default: amount of CPUs]')
+
+def lookup(cls, name):
+	"""
+	Returns the class defining the attribute *name* for the given class
+	"""
+	for x in cls.__mro__:
+		if name in x.__dict__:
+			return x
+	return None
+
+def get_run_fun(tsk):
+	"""
+	Returns the function generated from a single ``run_str`` string, or None if the task
+	must be executed by a thread (custom run method, overridden ``exec_command``, etc)
+	"""
+	cls = tsk.__class__
+	x = lookup(cls, 'run')
+	if x is None or not isinstance(x.__dict__.get('orig_run_str'), str):
+		return None
+	if 'run' in tsk.__dict__:
+		return None
+	if lookup(cls, 'exec_command') is not Task.TaskBase:
+		return None
+	if lookup(tsk.generator.bld.__class__, 'exec_command') is not Context.Context:
+		return None
+	return x.__dict__['run']
+
+class command_capture(object):
+	"""
+	Task proxy given to the compiled ``run_str`` functions to obtain the command
+	to execute and its parameters, instead of running the process
+	"""
+	def __init__(self, tsk):
+		self.__dict__['tsk'] = tsk
+		self.__dict__['cmd'] = None
+	def __getattr__(self, name):
+		return getattr(self.tsk, name)
+	def __setattr__(self, name, value):
+		setattr(self.tsk, name, value)
+	def exec_command(self, cmd, **kw):
+		self.__dict__['cmd'] = (cmd, kw)
+		return 0
+
+def get_command(tsk, fun):
+	"""
+	Computes the command of a task and applies the same transformations as
+	:py:meth:`waflib.Task.TaskBase.exec_command`.
+
+	:return: a tuple (cmd, kw) or None if the command must be executed by a thread
+	"""
+	proxy = command_capture(tsk)
+	fun(proxy)
+	if not proxy.cmd:
+		return None
+	cmd, kw = proxy.cmd
+
+	if not 'cwd' in kw:
+		kw['cwd'] = tsk.get_cwd()
+
+	if tsk.env.PATH:
+		env = kw['env'] = dict(kw.get('env') or tsk.env.env or os.environ)
+		env['PATH'] = tsk.env.PATH if isinstance(tsk.env.PATH, str) else os.pathsep.join(tsk.env.PATH)
+
+	if not isinstance(cmd, str) and (len(repr(cmd)) >= 8192 if Utils.is_win32 else len(cmd) > 200000):
+		# let the threads create the @argfile
+		return None
+
+	for k in kw:
+		if not k in ('cwd', 'env'):
+			return None
+	return (cmd, kw)
+
+if asyncio:
+	class process_protocol(asyncio.SubprocessProtocol):
+		"""
+		Collects the outputs of a process and calls *callback(ret, out, err)*
+		once the process has exited and all pipes are closed
+		"""
+		def __init__(self, callback):
+			self.callback = callback
+			self.transport = None
+			self.out = []
+			self.err = []
+			self.pending = 3
+		def connection_made(self, transport):
+			self.transport = transport
+		def pipe_data_received(self, fd, data):
+			if fd == 1:
+				self.out.append(data)
+			else:
+				self.err.append(data)
+		def pipe_connection_lost(self, fd, exc):
+			self.check()
+		def process_exited(self):
+			self.check()
+		def check(self):
+			self.pending -= 1
+			if not self.pending:
+				ret = self.transport.get_returncode()
+				self.transport.close()
+				self.callback(ret, b''.join(self.out), b''.join(self.err))
+
+shared_loop = None
+def get_event_loop():
+	"""
+	Returns an event loop running in a separate thread, shared by all builds
+	of the process so that the child watcher is set up only once
+	"""
+	global shared_loop
+	if not shared_loop:
+		if Utils.is_win32:
+			loop = asyncio.ProactorEventLoop()
+		else:
+			loop = asyncio.new_event_loop()
+			if sys.hexversion < 0x3080000:
+				# the child watcher must be attached from the main thread
+				watcher = asyncio.SafeChildWatcher()
+				asyncio.set_child_watcher(watcher)
+				watcher.attach_loop(loop)
+		t = Utils.threading.Thread(target=loop.run_forever)
+		t.daemon = True
+		t.start()
+		shared_loop = loop
+	return shared_loop
+
+class AsyncSpawner(Utils.threading.Thread):
+	"""
+	Replacement for :py:class:`waflib.Runner.Spawner`. The thread takes the tasks
+	from :py:attr:`waflib.Runner.Parallel.ready` and limits the amount of tasks
+	being processed to :py:attr:`waflib.Runner.Parallel.numjobs`. The processes are
+	started and awaited from an asyncio event loop running in a separate thread.
+	"""
+	def __init__(self, master):
+		if getattr(Task.TaskBase, 'jobserver_process', None):
+			raise Errors.WafError('asyncio_runner: the jobserver tool is not supported, load only one of them')
+		Utils.threading.Thread.__init__(self)
+		self.master = master
+		"""Instance of :py:class:`waflib.Runner.Parallel`"""
+		self.sem = Utils.threading.Semaphore(master.numjobs)
+		"""Bounds the amount of tasks being processed"""
+		threads = getattr(Options.options, 'async_threads', 0) or min(master.numjobs, os.cpu_count() or 1)
+		self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads)
+		"""Threads for the Python tasks"""
+		self.loop = get_event_loop()
+		"""Event loop starting and collecting the processes"""
+		self.daemon = True
+		self.start()
+
+	def run(self):
+		"""
+		Dispatches the tasks to the event loop until None is received
+		"""
+		master = self.master
+		while 1:
+			tsk = master.ready.get()
+			if tsk is None:
+				break
+			self.sem.acquire()
+			self.loop.call_soon_threadsafe(self.dispatch, tsk)
+		self.executor.shutdown(wait=False)
+
+	def finish(self, tsk):
+		"""
+		Returns a task to :py:attr:`waflib.Runner.Parallel.out`
+		"""
+		self.master.out.put(tsk)
+		self.sem.release()
+
+	def exception(self, tsk):
+		tsk.err_msg = Utils.ex_stack()
+		tsk.hasrun = Task.EXCEPTION
+		self.master.error_handler(tsk)
+
+	def process(self, tsk):
+		"""
+		Processes a task in the thread pool
+		"""
+		try:
+			if not self.master.stop:
+				tsk.process()
+		except Exception:
+			self.exception(tsk)
+		finally:
+			self.finish(tsk)
+
+	def dispatch(self, tsk):
+		"""
+		Starts executing a task, called from the event loop
+		"""
+		master = self.master
+		if master.stop:
+			self.finish(tsk)
+			return
+
+		bld = tsk.generator.bld
+		fun = ret = None
+		try:
+			master.log_display(tsk)
+			fun = get_run_fun(tsk)
+			if fun:
+				# same as in Task.TaskBase.process
+				try:
+					del bld.task_sigs[tsk.uid()]
+				except KeyError:
+					pass
+				start = time.time()
+				ret = get_command(tsk, fun)
+		except Exception:
+			self.exception(tsk)
+			self.finish(tsk)
+			return
+
+		if not fun or not ret:
+			self.executor.submit(self.process, tsk)
+			return
+
+		cmd, kw = ret
+		try:
+			coro = self.spawn(tsk, cmd, kw, start)
+		except Exception:
+			self.exception(tsk)
+			self.finish(tsk)
+		else:
+			self.loop.create_task(coro).add_done_callback(lambda x: self.spawned(tsk, x))
+
+	def spawn(self, tsk, cmd, kw, start):
+		"""
+		Returns the coroutine creating the process, see :py:meth:`waflib.Context.Context.exec_command`
+		"""
+		bld = tsk.generator.bld
+		shell = isinstance(cmd, str)
+		Logs.debug('runner: %r', cmd)
+		Logs.debug('runner_env: kw=%s', kw)
+
+		if bld.logger:
+			bld.logger.info(cmd)
+
+		if Logs.verbose and not shell and not Utils.check_exe(cmd[0]):
+			raise Errors.WafError('Program %s not found!' % cmd[0])
+
+		if not isinstance(kw['cwd'], str):
+			kw['cwd'] = kw['cwd'].abspath()
+
+		def callback(ret, out, err):
+			self.executor.submit(self.complete, tsk, ret, out, err, start)
+
+		subprocess = Utils.subprocess
+		args = dict(stdin=None, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=kw['cwd'], env=kw.get('env'))
+		if shell:
+			return self.loop.subprocess_shell(lambda: process_protocol(callback), cmd, **args)
+		return self.loop.subprocess_exec(lambda: process_protocol(callback), *cmd, **args)
+
+	def spawned(self, tsk, fut):
+		"""
+		Reports the processes that could not be started
+		"""
+		e = fut.exception()
+		if e:
+			tsk.err_msg = 'Execution failure: %s' % str(e)
+			tsk.hasrun = Task.EXCEPTION
+			self.master.error_handler(tsk)
+			self.finish(tsk)
+
+	def complete(self, tsk, ret, out, err, start):
+		"""
+		Logs the process outputs and finishes processing the task in the thread pool,
+		see :py:meth:`waflib.Task.TaskBase.process`
+		"""
+		bld = tsk.generator.bld
+		try:
+			if out:
+				out = out.decode(sys.stdout.encoding or 'iso8859-1')
+				if bld.logger:
+					bld.logger.debug('out: %s', out)
+				else:
+					Logs.info(out, extra={'stream':sys.stdout, 'c1': ''})
+			if err:
+				err = err.decode(sys.stdout.encoding or 'iso8859-1')
+				if bld.logger:
+					bld.logger.error('err: %s' % err)
+				else:
+					Logs.info(err, extra={'stream':sys.stderr, 'c1': ''})
+
+			if ret:
+				tsk.err_code = ret
+				tsk.hasrun = Task.CRASHED
+			else:
+				try:
+					tsk.post_run()
+				except Errors.WafError:
+					pass
+				except Exception:
+					tsk.err_msg = Utils.ex_stack()
+					tsk.hasrun = Task.EXCEPTION
+				else:
+					tsk.hasrun = Task.SUCCESS
+			if tsk.hasrun != Task.SUCCESS:
+				self.master.error_handler(tsk)
+			else:
+				self.master.add_duration(tsk, time.time() - start)
+		except Exception:
+			self.exception(tsk)
+		finally:
+			self.finish(tsk)
+
+if asyncio:
+	Runner.Spawner = AsyncSpawner
+else:
+	Logs.warn('asyncio_runner: asyncio is not available, the tasks are executed by threads')
@@ -0,0 +1,206 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+"""
+GNU make jobserver support (POSIX only). Sub-builds started from the tasks
+(make, cmake, cargo, gcc -flto=jobserver...) share the job slots of the waf build
+instead of picking their own ``-j`` value::
+
+	def options(opt):
+		opt.load('jobserver')
+	def build(bld):
+		bld(rule='$(MAKE) -C ${SRC[0].parent.abspath()}', source='sub/Makefile', always=True)
+
+When waf is not executed from make, it acts as a jobserver: a pipe holding
+``jobs - 1`` tokens is created for the duration of the build, and its file
+descriptors are given to the sub-processes through ``MAKEFLAGS``.
+
+When waf is executed from make (``+waf build`` or ``$(MAKE)`` in a recipe), it
+reads the jobserver description from ``MAKEFLAGS`` and acts as a client, so that
+the amount of processes remains bounded across the whole process tree.
+
+Each waf task holds a token while it is processed; the first one uses the
+implicit token of the waf process. This tool cannot be used with
+:py:mod:`waflib.extras.asyncio_runner`, which executes the commands without
+calling :py:meth:`waflib.Task.TaskBase.process`.
+"""
+
+import os, sys, re, errno, select
+from waflib import Runner, Task, Utils, Logs, Errors
+
+RE_AUTH = re.compile(r'--jobserver-(?:auth|fds)=(?:(\d+),(\d+)|fifo:(\S+))')
+
+class JobServer(object):
+	"""
+	Pool of tokens read from and written to a pipe
+
+	:param rfd: file descriptor to read tokens from
+	:type rfd: int
+	:param wfd: file descriptor to write tokens to
+	:type wfd: int
+	:param makeflags: value of ``MAKEFLAGS`` given to the sub-processes
+	:type makeflags: string
+	:param owner: whether the file descriptors are closed by :py:meth:`waflib.extras.jobserver.JobServer.close`
+	:type owner: bool
+	"""
+	def __init__(self, rfd, wfd, makeflags, owner=False):
+		self.rfd = rfd
+		self.wfd = wfd
+		self.makeflags = makeflags
+		self.owner = owner
+		self.lock = Utils.threading.Lock()
+		self.implicit = True
+		"""Whether the implicit token of this process is available"""
+
+	def acquire(self):
+		"""
+		Waits for a token
+
+		:return: the token read, or None for the implicit token
+		"""
+		with self.lock:
+			if self.implicit:
+				self.implicit = False
+				return None
+		while 1:
+			try:
+				token = os.read(self.rfd, 1)
+			except OSError as e:
+				if e.errno == errno.EAGAIN:
+					# non-blocking pipe
+					select.select([self.rfd], [], [])
+					continue
+				if e.errno != errno.EINTR:
+					raise
+			else:
+				if not token:
+					raise Errors.WafError('The jobserver pipe was closed')
+				return token
+
+	def release(self, token):
+		"""
+		Returns a token obtained by :py:meth:`waflib.extras.jobserver.JobServer.acquire`
+		"""
+		if token is None:
+			with self.lock:
+				self.implicit = True
+		else:
+			os.write(self.wfd, token)
+
+	def fds(self):
+		"""
+		:return: the file descriptors to keep open in the sub-processes
+		:rtype: tuple
+		"""
+		return (self.rfd, self.wfd)
+
+	def close(self):
+		if self.owner:
+			os.close(self.rfd)
+			os.close(self.wfd)
+
+def get_client(makeflags):
+	"""
+	Returns a :py:class:`waflib.extras.jobserver.JobServer` for the jobserver described in
+	*makeflags*, or None if there is no jobserver or if its file descriptors are not available
+	(recipe not marked as recursive)
+	"""
+	m = RE_AUTH.search(makeflags)
+	if not m:
+		return None
+	if m.group(3):
+		try:
+			rfd = os.open(m.group(3), os.O_RDONLY)
+			wfd = os.open(m.group(3), os.O_WRONLY)
+		except OSError:
+			Logs.warn('jobserver: could not open %r, ignoring the make jobserver', m.group(3))
+			return None
+		return JobServer(rfd, wfd, makeflags, owner=True)
+
+	rfd, wfd = int(m.group(1)), int(m.group(2))
+	try:
+		os.fstat(rfd)
+		os.fstat(wfd)
+	except OSError:
+		Logs.warn('jobserver: file descriptors not available, prefix the make recipe with "+"')
+		return None
+	return JobServer(rfd, wfd, makeflags)
+
+def create_server(jobs):
+	"""
+	Creates a :py:class:`waflib.extras.jobserver.JobServer` holding *jobs - 1* tokens
+	"""
+	rfd, wfd = os.pipe()
+	for fd in (rfd, wfd):
+		try:
+			os.set_inheritable(fd, True)
+		except AttributeError:
+			# python < 3.4
+			pass
+	os.write(wfd, b'+' * (jobs - 1))
+	flags = re.sub(r'(^|\s)-j\d*|--jobserver-\S+', '', os.environ.get('MAKEFLAGS', '')).strip()
+	flags = ('%s -j%d --jobserver-fds=%d,%d --jobserver-auth=%d,%d' % (flags, jobs, rfd, wfd, rfd, wfd)).strip()
+	return JobServer(rfd, wfd, flags, owner=True)
+
+client = None
+"""Jobserver of the parent make process, if any"""
+
+current = None
+"""Jobserver used by the build in progress"""
+
+if not Utils.is_win32:
+	client = get_client(os.environ.get('MAKEFLAGS', ''))
+
+def start(self):
+	"""
+	Sets up the jobserver for the duration of the build, see :py:meth:`waflib.Runner.Parallel.start`
+	"""
+	global current
+	prev = current
+	current = client or create_server(self.numjobs)
+	try:
+		return self.jobserver_start()
+	finally:
+		if current is not client:
+			current.close()
+		current = prev
+
+def process(self):
+	"""
+	Holds a token while the task is processed, see :py:meth:`waflib.Task.TaskBase.process`
+	"""
+	jobserver = current
+	if not jobserver:
+		return self.jobserver_process()
+	token = jobserver.acquire()
+	try:
+		return self.jobserver_process()
+	finally:
+		jobserver.release(token)
+
+def run_process(cmd, kwargs, cargs={}):
+	"""
+	Passes the jobserver to the sub-processes, see :py:func:`waflib.Utils.run_process`.
+	The pre-forked processes cannot inherit file descriptors, so they are not used
+	while a build is running.
+	"""
+	jobserver = current
+	if not jobserver:
+		return jobserver_run_process(cmd, kwargs, cargs)
+	env = kwargs['env'] = dict(kwargs.get('env') or os.environ)
+	env['MAKEFLAGS'] = jobserver.makeflags
+	if sys.hexversion < 0x3020000:
+		kwargs['close_fds'] = False
+	else:
+		kwargs['pass_fds'] = jobserver.fds()
+	return Utils.run_regular_process(cmd, kwargs, cargs)
+
+if Utils.is_win32:
+	Logs.warn('jobserver: the make jobserver is not supported on this platform')
+else:
+	Runner.Parallel.jobserver_start = Runner.Parallel.start
+	Runner.Parallel.start = start
+	Task.TaskBase.jobserver_process = Task.TaskBase.process
+	Task.TaskBase.process = process
+	jobserver_run_process = Utils.run_process
+	Utils.run_process = run_process
@@ -19,7 +19,13 @@ where:
 	host: host where the server resides, by default localhost
 	port: by default push on 11001 and pull on 12001
 
-Use the server provided in playground/netcache/Netcache.java
+Use the server provided in playground/netcache/Netcache.java, or the Python
+server playground/netcache/netcache_server.py (Python >= 3.5, no Java required)
+
+The connections are kept in pools and reused by the tasks. Before the tasks of a build
+group are executed, the signatures that can be computed already are sent in a single
+request (HAS), so that the tasks do not query the server one by one. The files of a task
+are requested at once (pipelining) instead of waiting for each file before asking for the next.
 """
 
 import os, socket, time, atexit, sys
@@ -34,6 +40,7 @@ STALE_TIME = 30 # seconds
 GET = 'GET'
 PUT = 'PUT'
 LST = 'LST'
+HAS = 'HAS'
 BYE = 'BYE'
 
 all_sigs_in_cache = (0.0, [])
@@ -41,12 +48,7 @@ all_sigs_in_cache = (0.0, [])
 def put_data(conn, data):
 	if sys.hexversion > 0x3000000:
 		data = data.encode('iso8859-1')
-	cnt = 0
-	while cnt < len(data):
-		sent = conn.send(data[cnt:])
-		if sent == 0:
-			raise RuntimeError('connection ended')
-		cnt += sent
+	conn.sendall(data)
 
 push_connections = Runner.Queue(0)
 pull_connections = Runner.Queue(0)
@@ -129,21 +131,7 @@ def check_cache(conn, ssig):
 		# read what is coming back
 		ret = read_header(conn)
 		size = int(ret.split(',')[0])
-
-		buf = []
-		cnt = 0
-		while cnt < size:
-			data = conn.recv(min(BUF, size-cnt))
-			if not data:
-				raise ValueError('connection ended %r %r' % (cnt, size))
-			buf.append(data)
-			cnt += len(data)
-
-		if sys.hexversion > 0x3000000:
-			ret = ''.encode('iso8859-1').join(buf)
-			ret = ret.decode('iso8859-1')
-		else:
-			ret = ''.join(buf)
+		ret = recv_data(conn, size)
 
 		all_sigs_in_cache = (time.time(), ret.splitlines())
 		Logs.debug('netcache: server cache has %r entries', len(all_sigs_in_cache[1]))
@@ -151,32 +139,70 @@ def check_cache(conn, ssig):
 	if not ssig in all_sigs_in_cache[1]:
 		raise ValueError('no file %s in cache' % ssig)
 
-class MissingFile(Exception):
-	pass
-
-def recv_file(conn, ssig, count, p):
-	check_cache(conn, ssig)
-
-	params = (GET, ssig, str(count))
-	put_data(conn, ','.join(params).ljust(HEADER_SIZE))
-	data = read_header(conn)
-
-	size = int(data.split(',')[0])
-
-	if size == -1:
-		raise MissingFile('no file %s - %s in cache' % (ssig, count))
-
-	# get the file, writing immediately
-	# TODO a tmp file would be better
-	f = open(p, 'wb')
+def recv_data(conn, size):
+	"""
+	Reads a response body of the given size
+	"""
+	buf = []
 	cnt = 0
 	while cnt < size:
 		data = conn.recv(min(BUF, size-cnt))
 		if not data:
 			raise ValueError('connection ended %r %r' % (cnt, size))
-		f.write(data)
+		buf.append(data)
 		cnt += len(data)
-	f.close()
+	ret = ''.encode('iso8859-1').join(buf)
+	if sys.hexversion > 0x3000000:
+		ret = ret.decode('iso8859-1')
+	return ret
+
+def has_files(conn, ssigs):
+	"""
+	Asks the server which entries exist, in a single round trip
+
+	:param ssigs: entry names
+	:type ssigs: list of string
+	:return: the names of the entries present on the server
+	:rtype: set of string
+	"""
+	body = '\n'.join(ssigs)
+	put_data(conn, ('%s,%d' % (HAS, len(body))).ljust(HEADER_SIZE) + body)
+	ret = read_header(conn)
+	size = int(ret.split(',')[0])
+	return set(recv_data(conn, size).splitlines())
+
+class MissingFile(Exception):
+	pass
+
+def recv_files(conn, ssig, paths, check=True):
+	"""
+	Downloads the files of an entry; the requests are all sent before the responses are read
+
+	:param check: whether to check the list of entries on the server first (see :py:func:`check_cache`)
+	"""
+	if check:
+		check_cache(conn, ssig)
+
+	put_data(conn, ''.join([('%s,%s,%d' % (GET, ssig, i)).ljust(HEADER_SIZE) for i in range(len(paths))]))
+	for (count, p) in enumerate(paths):
+		data = read_header(conn)
+		size = int(data.split(',')[0])
+		if size == -1:
+			raise MissingFile('no file %s - %s in cache' % (ssig, count))
+
+		# get the file, writing immediately
+		# TODO a tmp file would be better
+		f = open(p, 'wb')
+		try:
+			cnt = 0
+			while cnt < size:
+				data = conn.recv(min(BUF, size-cnt))
+				if not data:
+					raise ValueError('connection ended %r %r' % (cnt, size))
+				f.write(data)
+				cnt += len(data)
+		finally:
+			f.close()
 
 def sock_send(conn, ssig, cnt, p):
 	#print "pushing %r %r %r" % (ssig, cnt, p)
@@ -184,15 +210,16 @@ def sock_send(conn, ssig, cnt, p):
 	params = (PUT, ssig, str(cnt), str(size))
 	put_data(conn, ','.join(params).ljust(HEADER_SIZE))
 	f = open(p, 'rb')
-	cnt = 0
-	while cnt < size:
-		r = f.read(min(BUF, size-cnt))
-		while r:
-			k = conn.send(r)
-			if not k:
-				raise ValueError('connection ended')
-			cnt += k
-			r = r[k:]
+	try:
+		cnt = 0
+		while cnt < size:
+			r = f.read(min(BUF, size-cnt))
+			if not r:
+				raise ValueError('file %r changed while it was sent' % p)
+			conn.sendall(r)
+			cnt += len(r)
+	finally:
+		f.close()
 
 def can_retrieve_cache(self):
 	if not Task.pull_addr:
@@ -201,7 +228,11 @@ def can_retrieve_cache(self):
 		return False
 	self.cached = False
 
-	cnt = 0
+	# result of the lookup made for the whole build group, if any
+	present = getattr(self, 'netcache_present', None)
+	if present is False:
+		return False
+
 	sig = self.signature()
 	ssig = Utils.to_hex(self.uid() + sig)
 
@@ -210,14 +241,15 @@ def can_retrieve_cache(self):
 	try:
 		try:
 			conn = get_connection()
-			for node in self.outputs:
-				p = node.abspath()
-				recv_file(conn, ssig, cnt, p)
-				cnt += 1
+			recv_files(conn, ssig, [node.abspath() for node in self.outputs], check=not present)
 		except MissingFile as e:
 			Logs.debug('netcache: file is not in the cache %r', e)
 			err = True
 
+			# the responses to the next requests cannot be read reliably
+			close_connection(conn)
+			conn = None
+
 		except Exception as e:
 			Logs.debug('netcache: could not get the files %r', e)
 			err = True
@@ -270,6 +302,80 @@ def put_files_cache(self):
 
 	bld.task_sigs[self.uid()] = self.cache_sig
 
+def lookup_tasks(bld, tasks):
+	"""
+	Asks the server which tasks of a build group have their outputs in the cache, in a single round trip.
+	Only the tasks that must run and whose signatures do not depend on the outputs of tasks still
+	to be executed are considered; the others query the server when they are executed.
+	The result is stored in the attribute *netcache_present* of the tasks.
+	"""
+	if not Task.pull_addr:
+		return
+
+	pending = set()
+	for tsk in bld.cur_tasks:
+		if not tsk.hasrun:
+			pending.update(getattr(tsk, 'outputs', []))
+
+	todo = {}
+	for tsk in tasks:
+		if getattr(tsk, 'nocache', False) or not getattr(tsk, 'outputs', None) or tsk.hasrun:
+			continue
+		for t in tsk.run_after:
+			if not t.hasrun:
+				break
+		else:
+			nodes = tsk.inputs + tsk.dep_nodes
+			if pending.intersection(nodes):
+				continue
+			try:
+				sig = tsk.signature()
+			except Exception:
+				# the errors are reported when the task is executed
+				try:
+					del tsk.cache_sig
+				except AttributeError:
+					pass
+				continue
+			uid = tsk.uid()
+			if pending.intersection(tsk.get_implicit_nodes()):
+				# generated headers, for example
+				del tsk.cache_sig
+				continue
+			if bld.task_sigs.get(uid) == sig:
+				# probably up-to-date
+				continue
+			todo[Utils.to_hex(uid + sig)] = tsk
+
+	if not todo:
+		return
+
+	conn = None
+	try:
+		try:
+			conn = get_connection()
+			present = has_files(conn, list(todo.keys()))
+		except Exception as e:
+			Logs.debug('netcache: could not look up the tasks %r', e)
+			close_connection(conn)
+			conn = None
+			return
+	finally:
+		release_connection(conn)
+
+	Logs.debug('netcache: %d/%d entries present', len(present), len(todo))
+	for (ssig, tsk) in todo.items():
+		tsk.netcache_present = ssig in present
+
+def get_build_iterator(self):
+	"""
+	Looks up the tasks of each build group on the server, see :py:func:`lookup_tasks`
+	"""
+	for tasks in self.netcache_build_iterator():
+		if tasks:
+			lookup_tasks(self, tasks)
+		yield tasks
+
 def hash_env_vars(self, env, vars_lst):
 	# reimplement so that the resulting hash does not depend on local paths
 	if not env.table:
@@ -350,6 +456,9 @@ def setup_netcache(ctx, push_addr, pull_addr):
 	Task.push_addr = push_addr
 	Task.pull_addr = pull_addr
 	Build.BuildContext.hash_env_vars = hash_env_vars
+	if not getattr(Build.BuildContext, 'netcache_build_iterator', None):
+		Build.BuildContext.netcache_build_iterator = Build.BuildContext.get_build_iterator
+		Build.BuildContext.get_build_iterator = get_build_iterator
 	ctx.cache_global = True
 
 	for x in Task.classes.values():
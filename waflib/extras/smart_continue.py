@@ -36,6 +36,7 @@ def get_out(self):
 	tsk = self.out.get()
 	if not self.stop:
 		self.add_more_tasks(tsk)
+	self.mark_finished(tsk)
 	self.count -= 1
 	self.dirty = True
 	self.cancel_next(tsk) # new code
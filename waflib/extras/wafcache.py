@@ -0,0 +1,362 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+"""
+Local directory cache for the task outputs, shared by all the projects and
+checkouts of a machine, for example to avoid recompiling the files after
+switching branches::
+
+	def build(bld):
+		bld.load('wafcache')
+
+The cache entries are keyed by the task identifier and signature, computed
+from paths relative to the top-level directory so that checkouts made
+in different folders share the same entries.
+
+The following environment variables are used:
+
+* WAFCACHE: cache folder (default: ~/.cache/wafcache)
+* WAFCACHE_SIZE: maximum cache size in megabytes (default: 10240)
+* WAFCACHE_EVICT_INTERVAL: minimum amount of seconds between two evictions (default: 300)
+* WAFCACHE_NO_PUSH: set to 1 to use the cache without adding new entries
+
+The entries are added atomically (the files are copied into a temporary folder
+which is then renamed), so that several waf processes can use the same cache.
+The files are restored with a reflink when the file system supports it (Linux),
+or with a hard link, and by a copy otherwise. The least recently used entries
+are removed when the cache exceeds its size limit.
+
+Set ``nocache = True`` on task classes or task instances to disable the cache.
+"""
+
+import os, shutil, tempfile, time
+from waflib import Task, Logs, Utils, Build, Errors
+# the configuration variables are hashed without the path of the top-level directory
+from waflib.extras.netcache_client import hash_env_vars
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+FICLONE = 0x40049409
+"""Linux ioctl for reflinks (copy-on-write copies on btrfs, xfs)"""
+
+CACHE_DIR = os.environ.get('WAFCACHE', os.path.join(os.path.expanduser('~'), '.cache', 'wafcache'))
+CACHE_SIZE = int(os.environ.get('WAFCACHE_SIZE', 10240)) * 1024 * 1024
+EVICT_INTERVAL = int(os.environ.get('WAFCACHE_EVICT_INTERVAL', 300))
+NO_PUSH = os.environ.get('WAFCACHE_NO_PUSH') == '1'
+
+TRIM_RATIO = 0.8
+"""Fraction of the maximum cache size to reach when removing entries"""
+
+STALE_LOCK = 3600
+"""Age in seconds after which the eviction lock of a dead process is ignored"""
+
+stats_lock = Utils.threading.Lock()
+
+def add_stat(bld, idx, val):
+	"""
+	Updates the cache statistics (hits, misses, bytes added) from the consumer threads
+	"""
+	with stats_lock:
+		bld.wafcache_stats[idx] += val
+
+def link_file(src, dst):
+	"""
+	Creates *dst* from *src* by reflink, hard link or copy (in that order)
+	"""
+	try:
+		os.remove(dst)
+	except OSError:
+		pass
+	if fcntl:
+		try:
+			fs = open(src, 'rb')
+			try:
+				fd = open(dst, 'wb')
+				try:
+					fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+				finally:
+					fd.close()
+			finally:
+				fs.close()
+		except (IOError, OSError):
+			try:
+				os.remove(dst)
+			except OSError:
+				pass
+		else:
+			shutil.copystat(src, dst)
+			return
+	try:
+		os.link(src, dst)
+	except (AttributeError, OSError):
+		shutil.copy2(src, dst)
+
+def copy_file(src, dst):
+	"""
+	Creates *dst* from *src* by reflink or copy; hard links would let the next builds modify the cache
+	"""
+	if fcntl:
+		try:
+			fs = open(src, 'rb')
+			try:
+				fd = open(dst, 'wb')
+				try:
+					fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+				finally:
+					fd.close()
+			finally:
+				fs.close()
+		except (IOError, OSError):
+			pass
+		else:
+			shutil.copystat(src, dst)
+			return
+	shutil.copy2(src, dst)
+
+def entry_dir(ssig):
+	"""
+	:return: the folder of a cache entry
+	"""
+	return os.path.join(CACHE_DIR, ssig[:2], ssig)
+
+def cache_key(self):
+	"""
+	:return: the key of the task outputs in the cache, as a hexadecimal string
+	"""
+	return Utils.to_hex(self.uid() + self.signature())
+
+def can_retrieve_cache(self):
+	"""
+	Restores the task outputs from the cache
+
+	:return: True if all the outputs were restored
+	"""
+	if not self.outputs:
+		return False
+	self.cached = False
+	dname = entry_dir(self.cache_key())
+	try:
+		for (i, node) in enumerate(self.outputs):
+			link_file(os.path.join(dname, str(i)), node.abspath())
+		# for the eviction order
+		os.utime(dname, None)
+	except (IOError, OSError) as e:
+		Logs.debug('wafcache: no entry for %r: %r', self, e)
+		add_stat(self.generator.bld, 1, 1)
+		return False
+	add_stat(self.generator.bld, 0, 1)
+	self.cached = True
+	return True
+
+def put_files_cache(self):
+	"""
+	Adds the task outputs to the cache
+	"""
+	if NO_PUSH or not self.outputs or getattr(self, 'cached', None):
+		return
+	dname = entry_dir(self.cache_key())
+	if os.path.isdir(dname):
+		return
+
+	try:
+		if not os.path.isdir(os.path.dirname(dname)):
+			try:
+				os.makedirs(os.path.dirname(dname))
+			except OSError:
+				pass
+		tmp = tempfile.mkdtemp(prefix='tmp', dir=os.path.dirname(dname))
+		try:
+			size = 0
+			for (i, node) in enumerate(self.outputs):
+				dst = os.path.join(tmp, str(i))
+				copy_file(node.abspath(), dst)
+				size += os.stat(dst).st_size
+			# the rename is atomic; a concurrent process may have added the entry first
+			os.rename(tmp, dname)
+		except OSError:
+			shutil.rmtree(tmp, ignore_errors=True)
+			if not os.path.isdir(dname):
+				raise
+		else:
+			add_stat(self.generator.bld, 2, size)
+	except (IOError, OSError) as e:
+		Logs.debug('wafcache: could not add %r to the cache: %r', self, e)
+
+def uid(self):
+	"""
+	Same as :py:meth:`waflib.Task.Task.uid` but with paths relative to the top-level directory
+	"""
+	try:
+		return self.uid_
+	except AttributeError:
+		m = Utils.md5(self.__class__.__name__.encode('iso8859-1', 'xmlcharrefreplace'))
+		src = self.generator.bld.srcnode
+		up = m.update
+		for x in self.inputs + self.outputs:
+			up(x.path_from(src).encode('iso8859-1', 'xmlcharrefreplace'))
+		self.uid_ = m.digest()
+		return self.uid_
+
+def make_cached(cls):
+	"""
+	Wraps the methods *run* and *post_run* defined by a task class; the subclasses inherit the wrappers.
+	Called on the existing task classes when the tool is loaded, and from :py:class:`waflib.Task.store_task_type` afterwards
+	"""
+	if getattr(cls, 'nocache', None) or 'wafcache' in cls.__dict__:
+		return
+	cls.wafcache = True
+
+	if 'run' in cls.__dict__:
+		m1 = cls.run
+		def run(self):
+			if getattr(self, 'nocache', False):
+				return m1(self)
+			if self.can_retrieve_cache():
+				return 0
+			# outputs restored by hard links must not be modified in place
+			for node in self.outputs:
+				try:
+					if os.stat(node.abspath()).st_nlink > 1:
+						os.remove(node.abspath())
+				except OSError:
+					pass
+			return m1(self)
+		cls.run = run
+
+	if 'post_run' in cls.__dict__:
+		m2 = cls.post_run
+		def post_run(self):
+			ret = m2(self)
+			if not getattr(self, 'nocache', False):
+				self.put_files_cache()
+			return ret
+		cls.post_run = post_run
+
+def evict(bld):
+	"""
+	Removes the least recently used entries when the cache exceeds :py:const:`waflib.extras.wafcache.CACHE_SIZE`.
+	The cache is scanned at most once every :py:const:`waflib.extras.wafcache.EVICT_INTERVAL` seconds
+	and by one process at a time.
+	"""
+	hits, misses, size = bld.wafcache_stats
+	if hits or misses:
+		Logs.debug('wafcache: %d hits, %d misses, %d bytes added', hits, misses, size)
+	if not size:
+		return
+
+	stamp = os.path.join(CACHE_DIR, 'evict.stamp')
+	try:
+		if time.time() - os.stat(stamp).st_mtime < EVICT_INTERVAL:
+			return
+	except OSError:
+		pass
+
+	lock = os.path.join(CACHE_DIR, 'evict.lock')
+	try:
+		os.mkdir(lock)
+	except OSError:
+		# the process holding the lock may have died; only one process can rename it away
+		stale = lock + '.stale%d' % os.getpid()
+		try:
+			if time.time() - os.stat(lock).st_mtime < STALE_LOCK:
+				return
+			os.rename(lock, stale)
+		except OSError:
+			return
+		try:
+			if time.time() - os.stat(stale).st_mtime < STALE_LOCK:
+				# another process took over the stale lock in the meantime
+				os.rename(stale, lock)
+				return
+			os.rmdir(stale)
+			os.mkdir(lock)
+		except OSError:
+			return
+	# remove the lock only if it is the one created by this process
+	try:
+		ino = os.stat(lock).st_ino
+	except OSError:
+		return
+	try:
+		Utils.writef(stamp, '')
+
+		entries = []
+		total = 0
+		for x in Utils.listdir(CACHE_DIR):
+			sub = os.path.join(CACHE_DIR, x)
+			if len(x) != 2 or not os.path.isdir(sub):
+				continue
+			for y in Utils.listdir(sub):
+				dname = os.path.join(sub, y)
+				try:
+					st = os.stat(dname)
+					size = 0
+					for z in Utils.listdir(dname):
+						size += os.stat(os.path.join(dname, z)).st_size
+				except OSError:
+					continue
+				if y.startswith('tmp') or '.tmp' in y:
+					# addition or eviction in progress, or interrupted
+					if time.time() - st.st_mtime > STALE_LOCK:
+						shutil.rmtree(dname, ignore_errors=True)
+					else:
+						total += size
+					continue
+				entries.append((st.st_mtime, size, dname))
+				total += size
+
+		if total <= CACHE_SIZE:
+			return
+
+		entries.sort()
+		for (mtime, size, dname) in entries:
+			if total <= CACHE_SIZE * TRIM_RATIO:
+				break
+			# rename first so that other processes never see incomplete entries
+			tmp = dname + '.tmp%d' % os.getpid()
+			try:
+				os.rename(dname, tmp)
+			except OSError:
+				continue
+			shutil.rmtree(tmp, ignore_errors=True)
+			total -= size
+		Logs.debug('wafcache: trimmed the cache to %d bytes', total)
+	finally:
+		try:
+			if os.stat(lock).st_ino == ino:
+				os.rmdir(lock)
+		except OSError:
+			pass
+
+def build(bld):
+	if not os.path.isdir(CACHE_DIR):
+		try:
+			os.makedirs(CACHE_DIR)
+		except OSError:
+			if not os.path.isdir(CACHE_DIR):
+				raise Errors.WafError('Could not create the cache folder %r' % CACHE_DIR)
+
+	if getattr(Task.Task, 'put_files_cache', None) is put_files_cache:
+		# already set up
+		pass
+	else:
+		Task.Task.can_retrieve_cache = can_retrieve_cache
+		Task.Task.put_files_cache = put_files_cache
+		Task.Task.cache_key = cache_key
+		Task.Task.uid = uid
+		Build.BuildContext.hash_env_vars = hash_env_vars
+		for x in Task.classes.values():
+			make_cached(x)
+
+		# and the task classes created later, for example by the tools loaded afterwards
+		m0 = Task.store_task_type.__init__
+		def __init__(cls, name, bases, dict):
+			m0(cls, name, bases, dict)
+			make_cached(cls)
+		Task.store_task_type.__init__ = __init__
+
+	bld.wafcache_stats = [0, 0, 0]
+	bld.add_post_fun(evict)
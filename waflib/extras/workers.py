@@ -0,0 +1,378 @@
+#! /usr/bin/env python
+# encoding: utf-8
+
+"""
+Executes the task commands on worker daemons, for example on other machines
+having the same compilers installed at the same locations.
+
+Start one or several workers (the project only needs to load this tool)::
+
+	$ waf worker --worker-listen=0.0.0.0:9001
+	$ waf worker --worker-listen=unix:/tmp/waf_worker.sock
+
+Then build by giving the worker addresses::
+
+	$ waf build -j16 --workers=host1:9001,host2:9001,unix:/tmp/waf_worker.sock
+
+The commands are sent through the same framing as the pre-forked processes
+(see :py:func:`waflib.Utils.run_prefork_process`). The task input files are
+given by absolute path and content hash; only the files that a worker does not
+have are sent. The output files are shipped back in the same manner, so that
+nothing is transferred when the workers share the file system of the build.
+
+If a worker cannot be reached, the commands are executed locally.
+
+The tasks are still scheduled by :py:class:`waflib.Runner.Parallel` and executed
+by its consumer threads; only :py:meth:`waflib.Task.TaskBase.exec_command` is replaced,
+so the value of ``-j`` is the total amount of commands in progress on the workers.
+
+.. warning:: the workers execute any command they receive, use them on trusted networks only
+"""
+
+import os, sys, time, socket
+from waflib import Context, Task, Node, Options, Utils, Logs, Errors
+from waflib.Utils import cPickle, read_frame, write_frame
+
+try:
+	import socketserver
+except ImportError:
+	import SocketServer as socketserver
+
+def options(opt):
+	opt.add_option('--workers', action='store', default='', dest='workers',
+		help='comma-separated worker addresses, for example "host:9001,unix:/tmp/waf_worker.sock"')
+	opt.add_option('--worker-listen', action='store', default='127.0.0.1:9001', dest='worker_listen',
+		help='address to listen to in "waf worker" [Default: 127.0.0.1:9001]')
+
+def parse_address(addr):
+	"""
+	:return: a tuple (socket family, address) for 'host:port' or 'unix:/path'
+	"""
+	if addr.startswith('unix:'):
+		return (socket.AF_UNIX, addr[5:])
+	host, port = addr.rsplit(':', 1)
+	return (socket.AF_INET, (host, int(port)))
+
+hashes = {}
+hashes_lock = Utils.threading.Lock()
+def get_hash(path):
+	"""
+	Returns the hash of a file, or None if it does not exist. The values
+	are cached by file status (modification time, size, inode and change time),
+	except for the files modified less than :py:const:`waflib.Node.RACY_DELAY`
+	seconds ago (see :py:meth:`waflib.Node.Node.h_file_cached`)
+	"""
+	try:
+		st = os.stat(path)
+	except OSError:
+		return None
+	key = (getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size, st.st_ino, getattr(st, 'st_ctime_ns', st.st_ctime))
+	try:
+		k, h = hashes[path]
+		if k == key:
+			return h
+	except KeyError:
+		pass
+	h = Utils.h_file(path)
+	with hashes_lock:
+		if time.time() - max(st.st_mtime, st.st_ctime) > Node.RACY_DELAY:
+			hashes[path] = (key, h)
+		else:
+			hashes.pop(path, None)
+	return h
+
+def send_file(stream, path):
+	mode = ('%o' % (os.stat(path).st_mode & 0o777)).encode()
+	write_frame(stream, b'D', path.encode('utf-8') + b'\0' + mode + b'\0' + Utils.readf(path, 'rb'))
+
+def recv_file(stream, allowed):
+	"""
+	Writes a file received from the peer; the path must be one of *allowed*
+	(the inputs of the request on the worker side, the outputs on the client side)
+	"""
+	kind, data = read_frame(stream)
+	if kind != b'D':
+		raise IOError('Unexpected message %r' % kind)
+	path, mode, data = data.split(b'\0', 2)
+	path = path.decode('utf-8')
+	if not path in allowed:
+		raise IOError('Unexpected file %r' % path)
+	dirname = os.path.dirname(path)
+	if not os.path.isdir(dirname):
+		try:
+			os.makedirs(dirname)
+		except OSError:
+			pass
+	Utils.writef(path, data, 'wb')
+	os.chmod(path, int(mode, 8))
+	get_hash(path)
+
+# ----------------------------------------------------------------------------
+# worker side
+
+class worker_handler(socketserver.StreamRequestHandler):
+	"""
+	Executes the commands of one client connection, one at a time
+	"""
+	def handle(self):
+		envs = {0: None}
+		while 1:
+			try:
+				kind, data = read_frame(self.rfile)
+			except IOError:
+				break
+			if kind == b'E':
+				env_id, env = cPickle.loads(data)
+				envs[env_id] = env
+				continue
+			try:
+				self.execute(cPickle.loads(data), envs)
+			except IOError as e:
+				Logs.error('worker: closing the connection from %r: %s', self.client_address, e)
+				break
+
+	def execute(self, req, envs):
+		rfile, wfile = self.rfile, self.wfile
+
+		missing = [p for (p, h) in req['inputs'] if get_hash(p) != h]
+		write_frame(wfile, b'N', cPickle.dumps(missing, -1))
+		wfile.flush()
+		for p in missing:
+			recv_file(rfile, missing)
+
+		for x in [req['kw']['cwd']] + [os.path.dirname(x) for x in req['outputs']]:
+			if not os.path.isdir(x):
+				try:
+					os.makedirs(x)
+				except OSError:
+					pass
+
+		kw = req['kw']
+		kw['env'] = envs[req['env']]
+		kw['stdout'] = kw['stderr'] = Utils.subprocess.PIPE
+		Logs.debug('worker: %r', req['cmd'])
+
+		ex = trace = out = err = None
+		try:
+			ret, out, err = Utils.run_process(req['cmd'], kw, req['cargs'])
+		except Exception as e:
+			ret = 1
+			ex = e.__class__.__name__
+			trace = Utils.ex_stack()
+
+		if out:
+			write_frame(wfile, b'O', out)
+		if err:
+			write_frame(wfile, b'R', err)
+		outputs = [(p, get_hash(p)) for p in req['outputs']]
+		write_frame(wfile, b'S', cPickle.dumps([ret, ex, trace, outputs], -1))
+		wfile.flush()
+
+		kind, data = read_frame(rfile)
+		for p in cPickle.loads(data):
+			if not p in req['outputs']:
+				raise IOError('Unexpected file %r' % p)
+			send_file(wfile, p)
+		wfile.flush()
+
+class WorkerContext(Context.Context):
+	'''executes the commands sent by the builds given the --workers option'''
+	cmd = 'worker'
+
+	def execute(self):
+		family, addr = parse_address(Options.options.worker_listen)
+		if family == socket.AF_UNIX:
+			if os.path.exists(addr):
+				os.remove(addr)
+			cls = socketserver.ThreadingUnixStreamServer
+		else:
+			cls = socketserver.ThreadingTCPServer
+		cls.allow_reuse_address = True
+		cls.daemon_threads = True
+		server = cls(addr, worker_handler)
+		Logs.info('Waiting for commands on %s', Options.options.worker_listen)
+		try:
+			server.serve_forever()
+		except KeyboardInterrupt:
+			pass
+
+# ----------------------------------------------------------------------------
+# client side
+
+class connection(object):
+	def __init__(self, addr):
+		family, address = parse_address(addr)
+		self.addr = addr
+		self.sock = socket.socket(family, socket.SOCK_STREAM)
+		self.sock.connect(address)
+		self.rfile = self.sock.makefile('rb')
+		self.wfile = self.sock.makefile('wb')
+		self.envs = set([0])
+	def close(self):
+		for x in (self.rfile, self.wfile, self.sock):
+			try:
+				x.close()
+			except (socket.error, IOError):
+				pass
+
+class worker_pool(object):
+	"""
+	Connections to the workers; the commands are sent to the workers having the least commands in progress
+	"""
+	def __init__(self, addresses):
+		self.lock = Utils.threading.Lock()
+		self.idle = dict((x, []) for x in addresses)
+		self.busy = dict((x, 0) for x in addresses)
+
+	def acquire(self):
+		"""
+		:return: a connection, or None if no worker is available
+		"""
+		with self.lock:
+			if not self.busy:
+				return None
+			addr = min(self.busy, key=lambda x: self.busy[x])
+			self.busy[addr] += 1
+			if self.idle[addr]:
+				return self.idle[addr].pop()
+		try:
+			return connection(addr)
+		except socket.error as e:
+			self.remove(addr, e)
+			return self.acquire()
+
+	def release(self, conn):
+		with self.lock:
+			if conn.addr in self.busy:
+				self.busy[conn.addr] -= 1
+				self.idle[conn.addr].append(conn)
+				return
+		conn.close()
+
+	def remove(self, addr, e):
+		"""
+		Stops using a worker after a communication error
+		"""
+		with self.lock:
+			if addr in self.busy:
+				Logs.warn('Worker %s is not available: %s', addr, e)
+				del self.busy[addr]
+				for x in self.idle.pop(addr):
+					x.close()
+
+pool = None
+pool_lock = Utils.threading.Lock()
+def get_pool():
+	"""
+	Returns the worker pool, created once by the first consumer thread calling it
+	"""
+	global pool
+	if pool is None:
+		with pool_lock:
+			if pool is None:
+				addresses = [x.strip() for x in getattr(Options.options, 'workers', '').split(',') if x.strip()]
+				pool = worker_pool(addresses)
+	return pool
+
+def remote_exec(tsk, cmd, kw):
+	"""
+	Executes a command on a worker
+
+	:return: a tuple (ret, out, err), or None if no worker could execute the command
+	"""
+	env = kw.get('env') or dict(os.environ)
+	paths = [x.abspath() for x in tsk.inputs + getattr(tsk, 'dep_nodes', []) + tsk.get_implicit_nodes()]
+	inputs = [(p, get_hash(p)) for p in paths]
+	req = {'cmd': cmd, 'kw': {'cwd': kw['cwd']}, 'cargs': {}, 'env': Utils.get_process_env(env),
+		'inputs': inputs, 'outputs': [x.abspath() for x in tsk.outputs]}
+
+	p = get_pool()
+	while 1:
+		conn = p.acquire()
+		if not conn:
+			return None
+		try:
+			rfile, wfile = conn.rfile, conn.wfile
+			if not req['env'] in conn.envs:
+				write_frame(wfile, b'E', cPickle.dumps([req['env'], env], -1))
+				conn.envs.add(req['env'])
+			write_frame(wfile, b'C', cPickle.dumps(req, -1))
+			wfile.flush()
+
+			kind, data = read_frame(rfile)
+			for x in cPickle.loads(data):
+				if not x in paths:
+					raise IOError('Unexpected file %r' % x)
+				send_file(wfile, x)
+			wfile.flush()
+
+			out = err = None
+			while 1:
+				kind, data = read_frame(rfile)
+				if kind == b'O':
+					out = data
+				elif kind == b'R':
+					err = data
+				else:
+					break
+			ret, ex, trace, outputs = cPickle.loads(data)
+
+			wanted = [x for (x, h) in outputs if h is not None and x in req['outputs'] and get_hash(x) != h]
+			write_frame(wfile, b'N', cPickle.dumps(wanted, -1))
+			wfile.flush()
+			for x in wanted:
+				recv_file(rfile, wanted)
+		except (socket.error, IOError, EOFError) as e:
+			conn.close()
+			p.remove(conn.addr, e)
+			continue
+		p.release(conn)
+		if ex:
+			raise Errors.WafError('Execution failure on %s: %s' % (conn.addr, trace))
+		return (ret, out, err)
+
+def exec_command(self, cmd, **kw):
+	"""
+	Sends the commands to the workers, see :py:meth:`waflib.Task.TaskBase.exec_command`
+	"""
+	if isinstance(cmd, str) or not getattr(self, 'outputs', None) or set(kw.keys()) - set(['cwd', 'env']) or not get_pool().busy:
+		return self.local_exec_command(cmd, **kw)
+	if len(repr(cmd)) >= 8192 if Utils.is_win32 else len(cmd) > 200000:
+		# long command-lines are split into @argfiles locally, see waflib.Task.TaskBase.exec_command
+		return self.local_exec_command(cmd, **kw)
+
+	bld = self.generator.bld
+	if not 'cwd' in kw:
+		kw['cwd'] = self.get_cwd()
+	if not isinstance(kw['cwd'], str):
+		kw['cwd'] = kw['cwd'].abspath()
+	if self.env.PATH:
+		env = kw['env'] = dict(kw.get('env') or self.env.env or os.environ)
+		env['PATH'] = self.env.PATH if isinstance(self.env.PATH, str) else os.pathsep.join(self.env.PATH)
+
+	Logs.debug('runner: %r (worker)', cmd)
+	if bld.logger:
+		bld.logger.info(cmd)
+
+	ret = remote_exec(self, cmd, kw)
+	if ret is None:
+		return self.local_exec_command(cmd, **kw)
+	ret, out, err = ret
+
+	# see waflib.Context.Context.exec_command
+	if out:
+		out = out.decode(sys.stdout.encoding or 'iso8859-1')
+		if bld.logger:
+			bld.logger.debug('out: %s', out)
+		else:
+			Logs.info(out, extra={'stream':sys.stdout, 'c1': ''})
+	if err:
+		err = err.decode(sys.stdout.encoding or 'iso8859-1')
+		if bld.logger:
+			bld.logger.error('err: %s' % err)
+		else:
+			Logs.info(err, extra={'stream':sys.stderr, 'c1': ''})
+	return ret
+
+Task.TaskBase.local_exec_command = Task.TaskBase.exec_command
+Task.TaskBase.exec_command = exec_command
@@ -2,7 +2,7 @@
 # encoding: utf-8
 # Thomas Nagy, 2016 (ita)
 
-import sys, traceback, base64
+import os, sys, traceback, struct
 try:
 	import cPickle
 except ImportError:
@@ -13,12 +13,46 @@ try:
 except ImportError:
 	import subprocess
 
-def run():
-	txt = sys.stdin.readline().strip()
-	if not txt:
+# messages are framed as: kind (1 byte), length (4 bytes, network order), payload
+HEADER = '!cI'
+HEADER_SIZE = struct.calcsize(HEADER)
+
+if sys.platform == 'win32':
+	import msvcrt
+	msvcrt.setmode(sys.stdin.fileno(), os.O_BINARY)
+	msvcrt.setmode(sys.stdout.fileno(), os.O_BINARY)
+
+stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+
+envs = {0: None}
+"""Environments sent by the parent process, referenced by id in the commands"""
+
+def read_frame():
+	head = stdin.read(HEADER_SIZE)
+	if len(head) < HEADER_SIZE:
 		# parent process probably ended
 		sys.exit(1)
-	[cmd, kwargs, cargs] = cPickle.loads(base64.b64decode(txt))
+	kind, size = struct.unpack(HEADER, head)
+	data = stdin.read(size)
+	if len(data) < size:
+		sys.exit(1)
+	return kind, data
+
+def write_frame(kind, data):
+	stdout.write(struct.pack(HEADER, kind, len(data)))
+	stdout.write(data)
+
+def run():
+	kind, data = read_frame()
+	if kind == b'E':
+		# environment, sent once and then referenced by id
+		env_id, env = cPickle.loads(data)
+		envs[env_id] = env
+		return
+
+	[cmd, kwargs, cargs, env_id] = cPickle.loads(data)
+	kwargs['env'] = envs[env_id]
 	cargs = cargs or {}
 
 	ret = 1
@@ -33,16 +67,18 @@ def run():
 		trace = str(cmd) + '\n' + ''.join(exc_lines)
 		ex = e.__class__.__name__
 
-	# it is just text so maybe we do not need to pickle()
-	tmp = [ret, out, err, ex, trace]
-	obj = base64.b64encode(cPickle.dumps(tmp))
-	sys.stdout.write(obj.decode())
-	sys.stdout.write('\n')
-	sys.stdout.flush()
+	# the process outputs are sent as they are, without pickling
+	if isinstance(out, bytes):
+		write_frame(b'O', out)
+		out = None
+	if isinstance(err, bytes):
+		write_frame(b'R', err)
+		err = None
+	write_frame(b'S', cPickle.dumps([ret, out, err, ex, trace], -1))
+	stdout.flush()
 
 while 1:
 	try:
 		run()
 	except KeyboardInterrupt:
 		break
-